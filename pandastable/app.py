@@ -44,6 +44,7 @@ from .data import TableModel
 #from .prefs import Preferences
 from . import images, util, dialogs, plotting, config
 from .dialogs import MultipleValDialog
+from .formatting import RowColors
 from . import plugin
 
 class DataExplore(Frame):
@@ -382,6 +383,10 @@ class DataExplore(Frame):
 
         #load table settings
         util.setAttributes(table, tablesettings)
+        #projects saved before the font was shared stored it as a tuple
+        table.setFont()
+        if 'rowcolors' in tablesettings:
+            table.rowcolors = RowColors.fromData(tablesettings['rowcolors'])
         #load plotviewer
         if 'plotviewer' in meta:
             #print (meta['plotviewer'])
@@ -393,8 +398,6 @@ class DataExplore(Frame):
             util.setAttributes(table.child, childsettings)
 
         #redraw col selections
-        if type(table.multiplecollist) is tuple:
-            table.multiplecollist = list(table.multiplecollist)
         table.drawMultipleCols()
         return
 
@@ -412,12 +415,16 @@ class DataExplore(Frame):
         meta['table'] = util.getAttributes(table)
         meta['plotviewer'] = util.getAttributes(table.pf)
         #print (meta['plotviewer'])
-        #save row colors since its a dataframe and isn't picked up by getattributes currently
-        meta['table']['rowcolors'] = table.rowcolors
+        #save row colors and selections since they aren't picked up by getattributes
+        meta['table']['rowcolors'] = table.rowcolors.getData()
+        meta['table']['multiplerowlist'] = table.multiplerowlist.getData()
+        meta['table']['multiplecollist'] = table.multiplecollist.getData()
         #save child table if present
         if table.child != None:
             meta['childtable'] = table.child.model.df
             meta['childselected'] = util.getAttributes(table.child)
+            meta['childselected']['multiplerowlist'] = table.child.multiplerowlist.getData()
+            meta['childselected']['multiplecollist'] = table.child.multiplecollist.getData()
 
         return meta
 
@@ -34,7 +34,7 @@ except:
 from tkinter import font
 import math, time
 import os, types
-import string, copy
+import string, copy, re
 import platform
 import logging
 import numpy as np
@@ -44,7 +44,8 @@ from .headers import ColumnHeader, RowHeader, IndexHeader
 from .plotting import MPLBaseOptions, PlotViewer
 #from .prefs import Preferences
 from .dialogs import ImportDialog
-from . import images, util, config
+from .selection import RangeList
+from . import images, util, config, formatting
 from .dialogs import *
 
 themes = {'dark':{'cellbackgr':'gray25','grid_color':'gray50', 'textcolor':'#f2eeeb',
@@ -108,6 +109,30 @@ class Table(Canvas):
         self.multiplerowlist=[]
         self.multiplecollist=[]
         self.col_positions=[]
+        #key of the columns and widths col_positions was built for
+        self._colkey = None
+        #pooled cell text items, kept private so they are not saved as settings
+        self._textpool = {}
+        self._textpoolshape = (0,0)
+        self._textslots = {}
+        #region drawn by the last full redraw, used for scroll redraws
+        self._drawnkey = None
+        #stats used by formatting rules per column
+        self._rulestats = {}
+        #row color rectangles drawn, item: (start row, end row, col)
+        self._colorruns = {}
+        #pending redraw requests, merged and drawn once when idle
+        self._dirty = {}
+        self._redrawjob = None
+        self._lastpaint = 0
+        self._pending = 0
+        self._redrawstats = {'requests': 0, 'paints': 0, 'merged': 0}
+        #formatted cell text in pages, prefetched around the view
+        self._pagecache = formatting.PageCache()
+        #frame the cached pages were formatted from
+        self._pagekey = None
+        #pending check for column profiles made in the background
+        self._profilejob = None
         self.mode = 'normal'
         self.editable = True
         self.filtered = False
@@ -145,6 +170,15 @@ class Table(Canvas):
         return
 
     def close(self, evt=None):
+        self._pagecache.stop()
+        self.model.profiler.stop()
+        self.model.indexer.stop()
+        if self._redrawjob is not None:
+            self.after_cancel(self._redrawjob)
+            self._redrawjob = None
+        if self._profilejob is not None:
+            self.after_cancel(self._profilejob)
+            self._profilejob = None
         if hasattr(self, 'parenttable'):
             return
         if hasattr(self, 'pf') and self.pf is not None:
@@ -153,8 +187,29 @@ class Table(Canvas):
         if util.SCRATCH is not None:
             util.SCRATCH.destroy()
             util.SCRATCH = None
+            util.clearFontCache()
         return
 
+    def getRowSelection(self):
+        return self._rowselection
+
+    def setRowSelection(self, rows):
+        """Set the selected rows from a list, range or RangeList"""
+        self._rowselection = RangeList.fromData(rows)
+        return
+
+    def getColSelection(self):
+        return self._colselection
+
+    def setColSelection(self, cols):
+        """Set the selected columns from a list, range or RangeList"""
+        self._colselection = RangeList.fromData(cols)
+        return
+
+    #selections are kept as ranges, assigning a list converts it
+    multiplerowlist = property(getRowSelection, setRowSelection)
+    multiplecollist = property(getColSelection, setColSelection)
+
     def set_defaults(self):
         """Set default settings"""
 
@@ -188,21 +243,44 @@ class Table(Canvas):
         #store general per column formatting as sub dicts
         self.columnformats = {}
         self.columnformats['alignment'] = {}
-        self.rowcolors = pd.DataFrame()
+        self.rowcolors = formatting.RowColors()
+        #conditional formatting rules per column
+        self.colorrules = {}
         self.highlighted = None
+        #limit on redraws per second while dragging the scrollbars
+        self.maxfps = 30
+        #taller tables are drawn one page at a time from rowoffset
+        self.maxcanvasheight = 1000000
+        self.rowoffset = 0
         self.bg = Style().lookup('TLabel.label', 'background')
         return
 
     def setFont(self):
-        """Set font tuple"""
+        """Set the table font from font, fontsize and fontstyle. The table,
+        headers and cell entry share one named font so changing it here
+        restyles all their text items in place."""
 
         if type(self.fontsize) is str:
             self.fontsize = int(float(self.fontsize))
-        if hasattr(self, 'font'):
-            self.thefont = (self.font, self.fontsize, self.fontstyle)
-        #print (self.thefont)
+        if not hasattr(self, 'font'):
+            return
+        opts = {'family': self.font, 'size': self.fontsize,
+                'weight': 'bold' if self.fontstyle == 'bold' else 'normal',
+                'slant': 'italic' if self.fontstyle == 'italic' else 'roman'}
+        f = getattr(self, 'thefont', None)
+        if isinstance(f, font.Font):
+            f.configure(**opts)
+            #cached text widths were measured with the old settings
+            util.clearFontCache(f)
+        else:
+            self.thefont = font.Font(root=self, **opts)
         return
 
+    def getFontKey(self):
+        """Settings of the shared font, for caches that depend on it"""
+
+        return (self.font, self.fontsize, self.fontstyle)
+
     def setTheme(self, name='light'):
         """Set theme"""
 
@@ -210,12 +288,18 @@ class Table(Canvas):
         for s in style:
             if s in self.__dict__:
                 self.__dict__[s] = style[s]
-        self.redraw()
+        self.scheduleRedraw()
         return
 
     def mouse_wheel(self, event):
         """Handle mouse wheel scroll for windows"""
 
+        if self.isVirtual():
+            if event.num == 5 or event.delta == -120:
+                self.set_yviews('scroll', 1, UNITS)
+            if event.num == 4 or event.delta == 120:
+                self.set_yviews('scroll', -1, UNITS)
+            return
         if event.num == 5 or event.delta == -120:
             event.widget.yview_scroll(1, UNITS)
             self.rowheader.yview_scroll(1, UNITS)
@@ -224,7 +308,7 @@ class Table(Canvas):
                 return
             event.widget.yview_scroll(-1, UNITS)
             self.rowheader.yview_scroll(-1, UNITS)
-        self.redrawVisible()
+        self.scheduleRedraw('view')
         return
 
     def doBindings(self):
@@ -282,9 +366,9 @@ class Table(Canvas):
         self.Xscrollbar = AutoScrollbar(self.parentframe,orient=HORIZONTAL,command=self.set_xviews)
         self.Xscrollbar.grid(row=2,column=1,columnspan=1,sticky='news')
         self['xscrollcommand'] = self.Xscrollbar.set
-        self['yscrollcommand'] = self.Yscrollbar.set
+        self['yscrollcommand'] = self.set_yscrollbar
         self.tablecolheader['xscrollcommand'] = self.Xscrollbar.set
-        self.rowheader['yscrollcommand'] = self.Yscrollbar.set
+        self.rowheader['yscrollcommand'] = self.set_yscrollbar
         self.parentframe.rowconfigure(1,weight=1)
         self.parentframe.columnconfigure(1,weight=1)
 
@@ -316,7 +400,7 @@ class Table(Canvas):
 
         if self.currwidth !=self.parentframe.winfo_width() or \
            self.currheight != self.parentframe.winfo_height():
-            self.redrawVisible()
+            self.scheduleRedraw()
         self.currwidth = self.parentframe.winfo_width()
         self.currheight = self.parentframe.winfo_height()
 
@@ -347,25 +431,68 @@ class Table(Canvas):
         y_start = self.y_start
         row = (int(y)-y_start)/h
         if row < 0:
-            return 0
+            row = 0
+        row = int(row)+self.rowoffset
         if row > self.rows:
             row = self.rows
-        return int(row)
+        return row
 
     def getColPosition(self, x):
         """Get column position at coord"""
 
-        x_start = self.x_start
         w = self.cellwidth
-        i=0
-        col=0
-        for c in self.col_positions:
-            col = i
-            if c+w>=x:
-                break
-            i+=1
+        col = np.searchsorted(self.col_positions, x-w, side='left')
+        if col >= len(self.col_positions):
+            col = len(self.col_positions)-1
         return int(col)
 
+    def isVirtual(self):
+        """True if the table is too tall to be drawn on one canvas.
+        The canvas is then kept one page tall and rows are drawn relative
+        to rowoffset, the first row of the page."""
+
+        return self.rows*self.rowheight > self.maxcanvasheight
+
+    def getPageRows(self):
+        """Number of whole rows that fit in the window"""
+
+        h = self.master.winfo_height()
+        return max(int(h/self.rowheight), 1)
+
+    def getRowOrigin(self):
+        """Canvas y coordinate of row 0, rows are drawn at
+        getRowOrigin()+row*rowheight"""
+
+        return self.y_start - self.rowheight*self.rowoffset
+
+    def getRowExtent(self):
+        """Canvas y coordinates of the top and bottom of the rows on the
+        canvas, used for items spanning all rows"""
+
+        rows = self.rows
+        if self.isVirtual():
+            rows = min(rows-self.rowoffset, self.getPageRows()+1)
+        return self.y_start, self.y_start+rows*self.rowheight
+
+    def setRowOffset(self, row):
+        """Set the first row of the page in virtual mode"""
+
+        if not self.isVirtual():
+            self.rowoffset = 0
+            return
+        last = max(self.rows-self.getPageRows(), 0)
+        self.rowoffset = int(max(0, min(row, last)))
+        return
+
+    def getVirtualView(self):
+        """Visible fraction of the rows in virtual mode, for the
+        scrollbar"""
+
+        page = self.getPageRows()
+        first = float(self.rowoffset)/self.rows
+        last = min(float(self.rowoffset+page)/self.rows, 1.0)
+        return first, last
+
     def getVisibleRows(self, y1, y2):
         """Get the visible row range"""
 
@@ -402,7 +529,8 @@ class Table(Canvas):
             self.delete('entry')
             self.delete('rowrect','colrect')
             self.delete('currentrect','fillrect')
-            self.delete('gridline','text')
+            self.delete('gridline')
+            self.clearTextPool()
             self.delete('multicellrect','multiplesel')
             self.delete('colorrect')
             self.setColPositions()
@@ -420,9 +548,19 @@ class Table(Canvas):
         if self.filtered == True:
             self.delete('colrect')
 
-        self.rowrange = list(range(0,self.rows))
+        self.rowrange = range(0,self.rows)
+        if self.isVirtual():
+            #keep the canvas one page tall and draw from rowoffset
+            self.setRowOffset(self.rowoffset)
+            height = self.master.winfo_height()
+            if self.canvasy(0) != 0:
+                self.yview_moveto(0)
+                self.rowheader.yview_moveto(0)
+        else:
+            self.rowoffset = 0
+            height = self.rowheight*self.rows+10
         self.configure(scrollregion=(0,0, self.tablewidth+self.x_start,
-                        self.rowheight*self.rows+10))
+                        height))
 
         x1, y1, x2, y2 = self.getVisibleRegion()
         startvisiblerow, endvisiblerow = self.getVisibleRows(y1, y2)
@@ -431,39 +569,15 @@ class Table(Canvas):
         self.visiblecols = list(range(startvisiblecol, endvisiblecol))
 
         self.drawGrid(startvisiblerow, endvisiblerow)
-        align = self.align
         self.delete('fillrect')
-        bgcolor = self.cellbackgr
-        df = self.model.df
-
-        #st=time.time()
-        def set_precision(x, p):
-            if not pd.isnull(x):
-                if x<1:
-                    x = '{:.{}g}'.format(x, p)
-                else:
-                    x = '{:.{}f}'.format(x, p)
-            return x
-
-        prec = self.floatprecision
-        rows = self.visiblerows
-        for col in self.visiblecols:
-            coldata = df.iloc[rows,col]
-            colname = df.columns[col]
-            cfa = self.columnformats['alignment']
-            if colname in cfa:
-                align = cfa[colname]
-            else:
-                align = self.align
-            if prec != 0:
-                if coldata.dtype == 'float64':
-                    coldata = coldata.apply(lambda x: set_precision(x, prec), 1)
-                    #print (coldata)
-            coldata = coldata.astype(object).fillna('')
-            offset = rows[0]
-            for row in self.visiblerows:
-                text = coldata.iloc[row-offset]
-                self.drawText(row, col, text, align)
+        #hide any pooled text left showing cells that are not drawn now
+        shown = self._textslots
+        self._textslots = {}
+        self.setTextPoolSize(len(self.visiblerows), len(self.visiblecols))
+        self.drawCellText(self.visiblerows, self.visiblecols)
+        for slot in shown:
+            if slot not in self._textslots:
+                self.itemconfigure(self._textpool[slot], state='hidden', tags='text')
 
         self.colorColumns()
         self.colorRows()
@@ -479,38 +593,270 @@ class Table(Canvas):
             self.drawMultipleCells()
 
         self.drawHighlighted()
+        if self.isVirtual():
+            self.set_yscrollbar(0, 1)
+        self.prefetchPages()
+        self._drawnkey = self.getDrawnKey()
+        return
+
+    def getDrawnKey(self):
+        """Key for the state of the last full redraw. Scroll redraws fall
+        back to a full redraw if this has changed."""
+
+        return (id(self.model.df), self.rows, self.cols, self.rowheight,
+                self.tablewidth, self.floatprecision, self.rowoffset,
+                self.visiblerows[0], self.visiblerows[-1]+1,
+                self.visiblecols[0], self.visiblecols[-1]+1)
+
+    def redrawScrolled(self):
+        """Redraw after the view has been scrolled. Cells, grid lines and
+        header items still on screen stay where they are and only the rows
+        and columns that scrolled into view are drawn, so the cost depends
+        on how far the view moved. Falls back to a full redraw if the view
+        jumped by more than a page or the table has changed."""
+
+        if not hasattr(self, 'tablecolheader'):
+            return
+        key = self._drawnkey
+        if key is None or key[:7] != self.getDrawnKey()[:7]:
+            self.redrawVisible()
+            return
+        oldrows = (self.visiblerows[0], self.visiblerows[-1]+1)
+        oldcols = (self.visiblecols[0], self.visiblecols[-1]+1)
+        x1, y1, x2, y2 = self.getVisibleRegion()
+        newrows = self.getVisibleRows(y1, y2)
+        newcols = self.getVisibleCols(x1, x2)
+        if newrows == oldrows and newcols == oldcols:
+            return
+        R, C = self._textpoolshape
+        if newrows[0] >= oldrows[1] or newrows[1] <= oldrows[0] or \
+           newcols[0] >= oldcols[1] or newcols[1] <= oldcols[0] or \
+           newrows[1]-newrows[0] > R or newcols[1]-newcols[0] > C:
+            self.redrawVisible()
+            return
+
+        self.visiblerows = list(range(*newrows))
+        self.visiblecols = list(range(*newcols))
+        #slots of cells that left the view, hidden unless reused below
+        leaving = []
+        for r0,r1 in util.getRangeDifference(oldrows, newrows):
+            for row in range(r0,r1):
+                for col in range(*oldcols):
+                    leaving.append((row,col))
+        for c0,c1 in util.getRangeDifference(oldcols, newcols):
+            for col in range(c0,c1):
+                for row in range(max(oldrows[0],newrows[0]), min(oldrows[1],newrows[1])):
+                    leaving.append((row,col))
+        #blocks of cells that came into view
+        common = range(max(oldrows[0],newrows[0]), min(oldrows[1],newrows[1]))
+        exposed = [(range(r0,r1), self.visiblecols) for r0,r1 in
+                    util.getRangeDifference(newrows, oldrows)]
+        exposed += [(common, range(c0,c1)) for c0,c1 in
+                    util.getRangeDifference(newcols, oldcols)]
+        for rows,cols in exposed:
+            self.drawCellText(rows, cols)
+        for cell in leaving:
+            slot = self.getCellSlot(*cell)
+            if self._textslots.get(slot) == cell:
+                self.itemconfigure(self._textpool[slot], state='hidden', tags='text')
+                del self._textslots[slot]
+
+        #grid lines and headers
+        for r0,r1 in util.getRangeDifference((oldrows[0],oldrows[1]+1), (newrows[0],newrows[1]+1)):
+            for row in range(r0,r1):
+                self.delete('hline'+str(row))
+        for r0,r1 in util.getRangeDifference((newrows[0],newrows[1]+1), (oldrows[0],oldrows[1]+1)):
+            self.drawHorizLines(r0, r1)
+        for c0,c1 in util.getRangeDifference((oldcols[0],oldcols[1]+1), (newcols[0],newcols[1]+1)):
+            for col in range(c0,c1):
+                self.delete('vline'+str(col))
+        for c0,c1 in util.getRangeDifference((newcols[0],newcols[1]+1), (oldcols[0],oldcols[1]+1)):
+            self.drawVertLines(c0, c1)
+        if newcols != oldcols:
+            self.tablecolheader.redrawScrolled()
+        if newrows != oldrows:
+            self.rowheader.redrawScrolled()
+
+        #overlays that depend on the visible cells, only if used
+        if len(self.columncolors) > 0 and newcols != oldcols:
+            self.colorColumns()
+        if len(self.rowcolors.columns) > 0 or len(self.colorrules) > 0:
+            self.clipRowColors()
+            for rows,cols in exposed:
+                self.colorRows(rows, cols)
+        if len(self.multiplerowlist)>1:
+            self.rowheader.drawSelectedRows(self.multiplerowlist)
+            self.drawMultipleRows(self.multiplerowlist)
+        if self.highlighted is not None:
+            self.drawHighlighted()
+        self.prefetchPages()
+        self._drawnkey = self.getDrawnKey()
+        return
+
+    def prefetchPages(self):
+        """Format the pages of cells around the view in the background"""
+
+        if len(self.visiblerows) == 0 or len(self.visiblecols) == 0:
+            return
+        self._pagecache.prefetch(self.model.df, self.model.version,
+                                 self.visiblerows, self.visiblecols,
+                                 self.floatprecision)
+        return
+
+    def checkPages(self, clear=False):
+        """Drop the formatted pages if the frame or its columns were
+        replaced without a data change, or always if clear is True. Pages
+        are otherwise kept by data version, so scrolling and scheduled
+        redraws use those made ahead."""
+
+        key = self.model.getSortKey()
+        old = self._pagekey
+        if clear == True or old is None or old[1] is not key[1] or \
+            old[2] is not key[2]:
+            self._pagecache.clear()
+            self.model.clearCache()
+        self._pagekey = key
         return
 
     def redraw(self, event=None, callback=None):
-        """Redraw table"""
+        """Redraw table now. Any redraws already scheduled are merged
+        into this one. Cells are formatted again, so values changed in
+        place in the dataframe are shown."""
 
-        self.redrawVisible(event, callback)
-        if hasattr(self, 'statusbar'):
-            self.statusbar.update()
+        if hasattr(self, 'model'):
+            self.checkPages(clear=True)
+        self.scheduleRedraw()
+        self.flushRedraw(event, callback)
+        return
+
+    def scheduleRedraw(self, region='all', items=None, throttle=False):
+        """Mark part of the table as needing a redraw. Requests are merged
+        and drawn once when the event loop is idle, so several calls in a
+        row only paint once.
+
+        Args:
+            region: 'all', 'view' after scrolling, 'selection' when the
+                selection changed, 'cells' with items as
+                (row, col) tuples, 'rows' or 'cols' with items as positions,
+                or 'headers' with items from 'column', 'row' and 'index'
+            items: list of cells, rows, columns or headers for the region
+            throttle: limit redraws to maxfps per second, used for
+                scrollbar drags
+        """
+
+        if region in ['all','view','selection']:
+            self._dirty[region] = True
+        else:
+            if region not in self._dirty:
+                self._dirty[region] = set()
+            self._dirty[region].update(items)
+        self._redrawstats['requests'] += 1
+        self._pending += 1
+        if self._redrawjob is not None:
+            return
+        if throttle == True:
+            wait = 1.0/self.maxfps - (time.time()-self._lastpaint)
+            self._redrawjob = self.after(max(int(wait*1000),0), self.flushRedraw)
+        else:
+            self._redrawjob = self.after_idle(self.flushRedraw)
         return
 
+    def flushRedraw(self, event=None, callback=None):
+        """Draw all pending redraw requests in one pass"""
+
+        if self._redrawjob is not None:
+            self.after_cancel(self._redrawjob)
+            self._redrawjob = None
+        dirty = self._dirty
+        if len(dirty) == 0:
+            return
+        self._dirty = {}
+        stats = self._redrawstats
+        stats['paints'] += 1
+        stats['merged'] = self._pending
+        self._pending = 0
+        self._lastpaint = time.time()
+
+        if 'all' in dirty:
+            if hasattr(self, 'model'):
+                self.checkPages()
+            self.redrawVisible(event, callback)
+            if hasattr(self, 'statusbar'):
+                self.statusbar.update()
+            return
+        if 'view' in dirty:
+            self.redrawScrolled()
+        if not hasattr(self, 'tablecolheader') or len(self.visiblerows) == 0:
+            return
+        if 'selection' in dirty:
+            self.drawSelection()
+        headers = dirty.get('headers', [])
+        if 'column' in headers:
+            self.tablecolheader.redraw()
+        if 'row' in headers:
+            self.rowheader.redraw()
+        if 'index' in headers:
+            self.rowindexheader.redraw()
+        rows = self.visiblerows
+        cols = self.visiblecols
+        for row in sorted(dirty.get('rows', [])):
+            if rows[0] <= row <= rows[-1]:
+                self.drawCellText(range(row,row+1), cols)
+        for col in sorted(dirty.get('cols', [])):
+            if cols[0] <= col <= cols[-1]:
+                self.drawCellText(rows, range(col,col+1))
+        for row,col in dirty.get('cells', []):
+            if rows[0] <= row <= rows[-1] and cols[0] <= col <= cols[-1]:
+                self.drawCellText(range(row,row+1), range(col,col+1))
+        return
+
+    def getRedrawStats(self):
+        """Get counts of redraw requests and actual paints. merged is the
+        number of requests drawn by the last paint."""
+
+        return dict(self._redrawstats)
+
     def drawHighlighted(self):
         """Color an arbitrary selection of cells. Set the 'highlighted'
-        attribute which is a masked dataframe of the table."""
+        attribute which is a boolean mask array of the table. Hits in the
+        view are found with np.nonzero and adjacent hits in a column are
+        drawn as one rectangle."""
 
-        rows = self.visiblerows
         self.delete('temprect')
         hl = self.highlighted
-        if hl is not None:
-            for col in self.visiblecols:
-                coldata = hl.iloc[rows,col]
-                offset = rows[0]
-                for row in rows:
-                    val = coldata.iloc[row-offset]
-                    if val == True:
-                        self.drawRect(row, col, color='lightblue', tag='temprect', delete=1)
+        if hl is None or len(self.visiblerows) == 0:
+            return
+        if isinstance(hl, pd.DataFrame):
+            hl = self.highlighted = hl.values.astype(bool)
+        r0, r1 = self.visiblerows[0], self.visiblerows[-1]+1
+        c0, c1 = self.visiblecols[0], self.visiblecols[-1]+1
+        block = hl[r0:r1, c0:c1]
+        #hits ordered by column then row
+        cc, rr = np.nonzero(block.T)
+        if len(rr) == 0:
+            return
+        breaks = np.nonzero((np.diff(cc) != 0) | (np.diff(rr) != 1))[0]+1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(rr)]])
+        h = self.rowheight
+        y_start = self.getRowOrigin()
+        w = 1
+        for s,e in zip(starts, ends):
+            col = c0+cc[s]
+            x1 = self.col_positions[col]
+            x2 = self.col_positions[col+1]
+            y1 = y_start+h*(r0+rr[s])
+            y2 = y_start+h*(r0+rr[e-1]+1)
+            self.create_rectangle(x1+w/2,y1+w/2,x2-w/2,y2-w/2,
+                                  fill='lightblue', outline='lightblue',
+                                  width=w, tag='temprect')
+        self.lower('temprect')
         return
 
     def redrawCell(self, row=None, col=None, recname=None, colname=None):
         """Redraw a specific cell only"""
 
         text = self.model.getValueAt(row,col)
-        self.delete('celltext'+str(col)+'_'+str(row))
         self.drawText(row, col, text)
         return
 
@@ -534,51 +880,144 @@ class Table(Canvas):
 
         if cols is None:
             cols = self.visiblecols
-        self.delete('colorrect')
+        self.delete('colcolorrect')
         for c in cols:
             colname = self.model.df.columns[c]
             if colname in self.columncolors:
                 clr = self.columncolors[colname]
-                self.drawSelectedCol(c, delete=0, color=clr, tag='colorrect')
+                self.drawSelectedCol(c, delete=0, color=clr,
+                                     tag=('colorrect','colcolorrect'))
+        self.lower('colcolorrect')
         return
 
     def resetColors(self):
         df = self.model.df
-        #self.rowcolors = pd.DataFrame(index=range(len(df)))
-        self.rowcolors = pd.DataFrame(index=df.index)
+        self.rowcolors = formatting.RowColors(df.index)
         return
 
-    def setColorByMask(self, col, mask, clr):
-        """Color individual cells in a column using a mask."""
+    def setCellColors(self, col, colors, rows=None):
+        """Set colors of cells in a column.
+
+        Args:
+            col: column name
+            colors: a color or array of colors, one per row
+            rows: table row positions or boolean mask, default all rows
+        """
 
         df = self.model.df
         if len(self.rowcolors) == 0:
             self.resetColors()
         rc = self.rowcolors
-        if col not in rc.columns:
-            rc[col] = pd.Series()
-        rc[col] = rc[col].where(-mask, clr)
-        #print (rc)
+        if rows is not None:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.nonzero(rows)[0]
+        #map to rowcolors positions if the table rows have been reordered
+        indexer = rc.getIndexer(df.index)
+        if indexer is not None:
+            if rows is None:
+                rows = np.arange(len(df))
+            ix = indexer[rows]
+            keep = ix>=0
+            if np.ndim(colors) > 0:
+                colors = np.asarray(colors, dtype=object)[keep]
+            rows = ix[keep]
+        rc.setColors(col, colors, rows)
+        return
+
+    def setColorByMask(self, col, mask, clr):
+        """Color individual cells in a column using a mask."""
+
+        self.setCellColors(col, clr, mask)
         return
 
-    def colorRows(self):
-        """Color individual cells in column(s). Requires that the rowcolors
-         dataframe has been set. This needs to be updated if the index is reset"""
+    def colorRows(self, rows=None, cols=None):
+        """Color individual cells in column(s) from the rowcolors palette
+         codes. Colors are matched to rows by index label if the table rows
+         have been reordered.
+         Adjacent cells of the same color in a column are drawn as one
+         rectangle.
+
+         Args:
+            rows: contiguous row positions to color, by default all the
+                visible cells are redrawn
+            cols: column positions to color
+         """
 
-        #print (self.rowcolors)
         df = self.model.df
         rc = self.rowcolors
-        rows = self.visiblerows
-        offset = rows[0]
-        idx = df.index[rows]
-        for col in self.visiblecols:
+        if rows is None:
+            self.delete('rowcolorrect')
+            self._colorruns = {}
+            rows = self.visiblerows
+            cols = self.visiblecols
+        rules = self.colorrules
+        if (len(rc.columns) == 0 and len(rules) == 0) or len(rows) == 0:
+            return
+        start, end = rows[0], rows[-1]+1
+        if len(rc.columns) > 0:
+            indexer = rc.getIndexer(df.index)
+        h = self.rowheight
+        y_start = self.getRowOrigin()
+        w = 1
+        for col in cols:
             colname = df.columns[col]
-            if colname in list(rc.columns):
-                colors = rc[colname].loc[idx]
-                for row in rows:
-                    clr = colors.iloc[row-offset]
-                    if not pd.isnull(clr):
-                        self.drawRect(row, col, color=clr, tag='colorrect', delete=1)
+            if colname not in rc.columns and colname not in rules:
+                continue
+            if colname in rc.columns:
+                codes = rc.getCodes(colname, start, end, indexer)
+            else:
+                codes = np.zeros(end-start, dtype=rc.getDtype())
+            if colname in rules:
+                #rule colors override set colors
+                rcodes = rc.encode(self.getRuleColors(col, start, end))
+                codes = np.where(rcodes>0, rcodes, codes)
+            palette = rc.palette
+            #split into runs of the same color
+            bounds = np.nonzero(codes[1:] != codes[:-1])[0]+1
+            bounds = np.concatenate([[0], bounds, [len(codes)]])
+            x1 = self.col_positions[col]
+            x2 = self.col_positions[col+1]
+            for i in range(len(bounds)-1):
+                r0, r1 = bounds[i], bounds[i+1]
+                if codes[r0] == 0:
+                    continue
+                clr = palette[codes[r0]]
+                if clr == self.cellbackgr:
+                    continue
+                y1 = y_start+h*(start+r0)
+                y2 = y_start+h*(start+r1)
+                item = self.create_rectangle(x1+w/2,y1+w/2,x2-w/2,y2-w/2,
+                                      fill=clr, outline=clr, width=w,
+                                      tag=('colorrect','rowcolorrect'))
+                self._colorruns[item] = (start+r0, start+r1, col)
+        self.lower('rowcolorrect')
+        self.lower('colcolorrect')
+        return
+
+    def clipRowColors(self):
+        """Remove or trim row color rectangles that have scrolled out of
+        view"""
+
+        r0, r1 = self.visiblerows[0], self.visiblerows[-1]+1
+        c0, c1 = self.visiblecols[0], self.visiblecols[-1]+1
+        h = self.rowheight
+        y_start = self.getRowOrigin()
+        w = 1
+        runs = self._colorruns
+        for item in list(runs):
+            start, end, col = runs[item]
+            if end <= r0 or start >= r1 or col < c0 or col >= c1:
+                self.delete(item)
+                del runs[item]
+            elif start < r0 or end > r1:
+                #trim to the view so it does not overlap exposed rows later
+                start, end = max(start,r0), min(end,r1)
+                x1 = self.col_positions[col]
+                x2 = self.col_positions[col+1]
+                self.coords(item, x1+w/2, y_start+h*start+w/2,
+                            x2-w/2, y_start+h*end-w/2)
+                runs[item] = (start, end, col)
         return
 
     def setRowColors(self, rows=None, clr=None, cols=None):
@@ -596,17 +1035,13 @@ class Table(Canvas):
         if rows == None:
             rows = self.multiplerowlist
         df = self.model.df
-        idx = df.index[rows]
-        rc = self.rowcolors
         if cols is None:
             cols = self.multiplecollist
-        elif cols is 'all':
+        elif cols == 'all':
             cols = range(len(df.columns))
         colnames = df.columns[cols]
         for c in colnames:
-            if c not in rc.columns:
-                rc[c] = pd.Series(np.nan,index=df.index)
-            rc[c][idx] = clr
+            self.setCellColors(c, clr, rows)
         self.redraw()
         return
 
@@ -628,14 +1063,86 @@ class Table(Canvas):
         df = self.model.df
         for col in cols:
             colname = df.columns[col]
-            x = df[colname]
-            clrs = self.values_to_colors(x, cmap, alpha)
-            clrs = pd.Series(clrs,index=df.index)
-            rc = self.rowcolors
-            rc[colname] = clrs
+            rule = formatting.makeRule('colormap', cmap=cmap, alpha=alpha)
+            self.addColorRule(colname, rule)
+        self.redraw()
+        return
+
+    def setConditionalFormat(self):
+        """Add a conditional formatting rule to the selected columns"""
+
+        kinds = ['threshold','topn','nulls']
+        ops = list(formatting.operators.keys())
+        d = MultipleValDialog(title='conditional format',
+                                initialvalues=[kinds,ops,0,10,1],
+                                labels=['rule:','operator:','value:','top n:',
+                                        'largest:'],
+                                types=['combobox','combobox','string','int',
+                                       'checkbutton'],
+                                parent = self.parentframe)
+        if d.result == None:
+            return
+        kind = d.results[0]
+        clr = pickColor(self, formatting.ruletypes[kind]['color'])
+        if clr == None:
+            return
+        if kind == 'threshold':
+            value = d.results[2]
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+            rule = formatting.makeRule(kind, op=d.results[1], value=value, color=clr)
+        elif kind == 'topn':
+            rule = formatting.makeRule(kind, n=int(d.results[3]),
+                                       largest=bool(d.results[4]), color=clr)
+        else:
+            rule = formatting.makeRule(kind, color=clr)
+        df = self.model.df
+        for col in self.multiplecollist:
+            self.addColorRule(df.columns[col], rule)
+        self.redraw()
+        return
+
+    def addColorRule(self, colname, rule):
+        """Add a conditional formatting rule to a column. Rules are
+        evaluated for the visible rows when drawn, see formatting.applyRules"""
+
+        if colname not in self.colorrules:
+            self.colorrules[colname] = []
+        self.colorrules[colname].append(rule)
+        return
+
+    def clearColorRules(self, cols=None):
+        """Remove conditional formatting rules from columns"""
+
+        if cols is None:
+            cols = self.multiplecollist
+        df = self.model.df
+        for col in cols:
+            self.colorrules.pop(df.columns[col], None)
         self.redraw()
         return
 
+    def getRuleColors(self, col, start, end):
+        """Get the colors from the formatting rules of a column for a block
+        of rows. The whole column stats the rules need are kept until the
+        data or rules change."""
+
+        df = self.model.df
+        colname = df.columns[col]
+        rules = self.colorrules[colname]
+        #the blocks also change if a column was replaced without a data change
+        version, frame, blocks, index = self.model.getSortKey()
+        key = (version, str(rules))
+        cached = self._rulestats.get(colname)
+        if cached is None or cached[0] != key or cached[1] is not blocks:
+            stats = formatting.getRuleStats(df.iloc[:,col], rules)
+            cached = (key, blocks, stats)
+            self._rulestats[colname] = cached
+        values = df.iloc[start:end,col].values
+        return formatting.applyRules(values, rules, cached[2])
+
     def values_to_colors(self, x, cmap='jet', alpha=1):
         """Convert columnn values to colors"""
 
@@ -674,11 +1181,7 @@ class Table(Canvas):
         return
 
     def getScale(self):
-        try:
-            fontsize = self.thefont[1]
-        except:
-            fontsize = self.fontsize
-        scale = 8.5 * float(fontsize)/9
+        scale = 8.5 * float(self.fontsize)/9
         return scale
 
     def setWrap(self):
@@ -693,23 +1196,44 @@ class Table(Canvas):
     def zoomIn(self):
         """Zoom in, increases font and row heights."""
 
-        self.fontsize = self.fontsize+1
-        self.rowheight += 2
-        self.tablecolheader.height +=1
-        self.setFont()
-        self.adjustColumnWidths()
-        self.redraw()
+        self.zoom(1)
         return
 
     def zoomOut(self):
         """Zoom out, decreases font and row heights."""
 
-        self.fontsize = self.fontsize-1
-        self.rowheight -= 2
-        self.tablecolheader.height -=1
+        self.zoom(-1)
+        return
+
+    def zoom(self, step=1):
+        """Change the font size by step and row heights by twice that.
+        The shared font is reconfigured, items already drawn are scaled
+        in place and column widths are scaled by the font size ratio
+        instead of being measured again.
+        Args:
+            step: font size change
+        """
+
+        oldsize, oldheight = self.fontsize, self.rowheight
+        if oldsize+step < 2 or oldheight+2*step < 4:
+            return
+        self.fontsize += step
+        self.rowheight += 2*step
+        self.tablecolheader.height += step
         self.setFont()
-        self.adjustColumnWidths()
-        self.redraw()
+        xs = float(self.fontsize)/oldsize
+        ys = float(self.rowheight)/oldheight
+        widths = self.columnwidths
+        for c in widths:
+            widths[c] = max(int(round(widths[c]*xs)), self.mincellwidth)
+        #show the zoomed view at once, the redraw when idle then fills
+        #the rows and columns that now fit and re-truncates text, so
+        #repeated zooms are drawn once
+        self.scale('all', 0, 0, xs, ys)
+        self.rowheader.scale('all', 0, 0, 1, ys)
+        self.tablecolheader.scale('all', 0, 0, xs, 1)
+        #formatted text doesn't change so the page cache is kept
+        self.scheduleRedraw()
         return
 
     def expandColumns(self):
@@ -735,29 +1259,42 @@ class Table(Canvas):
     def adjustColumnWidths(self, limit=30):
         """Optimally adjust col widths to accomodate the longest entry
             in each column - usually only called on first redraw.
+            Widths come from the column profiles, other columns are
+            profiled in the background and resized when ready.
         Args:
-            limit: max number of columns to resize
+            limit: max number of columns to profile before drawing
             """
 
-        fontsize = self.fontsize
-        scale = self.getScale()
-        if self.cols > limit:
-            return
         self.cols = self.model.getColumnCount()
-        for col in range(self.cols):
+        df = self.model.df
+        profiler = self.model.profiler
+        profiles = profiler.getProfiles(df, range(min(limit, self.cols)), wait=True)
+        profiles.update(profiler.getProfiles(df, range(limit, self.cols)))
+        missing = [c for c in profiles if profiles[c] is None]
+        self.setProfileWidths(profiles)
+        if len(missing) > 0:
+            profiler.request(df, missing)
+            self.waitForProfiles()
+        return
+
+    def setProfileWidths(self, profiles):
+        """Set column widths to fit the longest string in the profiled
+        rows of each column"""
+
+        for col in profiles:
+            p = profiles[col]
+            if p is None:
+                continue
             colname = self.model.getColumnName(col)
             if colname in self.columnwidths:
                 w = self.columnwidths[colname]
                 #don't adjust large columns as user has probably resized them
                 if w>200:
                     continue
-            else:
-                w = self.cellwidth
-            l = self.model.getlongestEntry(col)
+            l = p['maxlength']
             txt = ''.join(['X' for i in range(l+1)])
             tw,tl = util.getTextLength(txt, self.maxcellwidth,
                                        font=self.thefont)
-            #print (col,txt,l,tw)
             if tw >= self.maxcellwidth:
                 tw = self.maxcellwidth
             elif tw < self.cellwidth:
@@ -765,6 +1302,29 @@ class Table(Canvas):
             self.columnwidths[colname] = tw
         return
 
+    def waitForProfiles(self):
+        """Check back later for column profiles made in the background"""
+
+        if self._profilejob is None:
+            self._profilejob = self.after(200, self.checkProfiles)
+        return
+
+    def checkProfiles(self):
+        """Resize columns and update the status bar once the background
+        column profiles are ready"""
+
+        self._profilejob = None
+        profiler = self.model.profiler
+        if profiler.isBusy():
+            self.waitForProfiles()
+            return
+        #don't request again, columns that failed stay as they are
+        self.setProfileWidths(profiler.getProfiles(self.model.df))
+        if hasattr(self, 'statusbar'):
+            self.statusbar.updateMemory()
+        self.redraw()
+        return
+
     def autoResizeColumns(self):
         """Automatically set nice column widths and draw"""
 
@@ -773,26 +1333,36 @@ class Table(Canvas):
         return
 
     def setColPositions(self):
-        """Determine current column grid positions"""
+        """Determine current column grid positions. These are kept as a
+        cumulative numpy array of the widths and only rebuilt when the
+        columns or column widths have changed."""
 
         df = self.model.df
-        self.col_positions=[]
-        w = self.cellwidth
-        x_pos = self.x_start
-        self.col_positions.append(x_pos)
-        for col in range(self.cols):
-            try:
-                colname = df.columns[col].encode('utf-8','ignore').decode('utf-8')
-            except:
-                colname = str(df.columns[col])
-            if colname in self.columnwidths:
-                x_pos = x_pos+self.columnwidths[colname]
-            else:
-                x_pos = x_pos+w
-            self.col_positions.append(x_pos)
-        self.tablewidth = self.col_positions[len(self.col_positions)-1]
+        key = (df.columns, self.cellwidth, self.x_start,
+               tuple(self.columnwidths.items()))
+        old = self._colkey
+        if old is not None and old[0] is key[0] and old[1:] == key[1:] \
+            and isinstance(self.col_positions, np.ndarray):
+            self.tablewidth = self.col_positions[-1]
+            return
+        names = [str(c) for c in df.columns]
+        widths = pd.Series(names, dtype=object).map(self.columnwidths)
+        widths = widths.fillna(self.cellwidth).values
+        if np.all(widths == widths.astype(int)):
+            widths = widths.astype(int)
+        else:
+            widths = widths.astype(float)
+        self.col_positions = np.concatenate([[self.x_start],
+                                             self.x_start+np.cumsum(widths)])
+        self.tablewidth = self.col_positions[-1]
+        self._colkey = key
         return
 
+    def getColumnWidth(self, col):
+        """Get the width of a column by index"""
+
+        return self.col_positions[col+1]-self.col_positions[col]
+
     def sortTable(self, columnIndex=None, ascending=1, index=False):
         """Sort rows based on currently selected columns"""
 
@@ -803,17 +1373,28 @@ class Table(Canvas):
             columnIndex = [columnIndex]
         #assert len(columnIndex) < len(df.columns)
         if index == True:
-            df.sort_index(inplace=True)
+            #through the model so a filter keeps its rows
+            colnames = []
         else:
             colnames = list(df.columns[columnIndex])
-            for col in colnames:
-                if df[col].dtype is 'category':
-                    print (df[col].cats)
-            try:
-                df.sort_values(by=colnames, inplace=True, ascending=ascending)
-            except Exception as e:
-                print('could not sort')
-                logging.error("Exception occurred", exc_info=True)
+        try:
+            indexer = self.model.sortRows(colnames, ascending=ascending)
+        except Exception as e:
+            print('could not sort')
+            logging.error("Exception occurred", exc_info=True)
+        else:
+            self.alignRows(indexer, df.index)
+        self.redraw()
+        return
+
+    def restoreOrder(self):
+        """Undo sorting, putting rows back in their original order"""
+
+        df = self.model.df
+        indexer = self.model.restoreOrder()
+        if indexer is None:
+            return
+        self.alignRows(indexer, df.index)
         self.redraw()
         return
 
@@ -850,7 +1431,7 @@ class Table(Canvas):
         self.setSelectedCol(0)
         #self.update_rowcolors()
         self.set_rowcolors_index()
-        self.redraw()
+        self.scheduleRedraw()
         if hasattr(self, 'pf'):
             self.pf.updateData()
         return
@@ -864,14 +1445,12 @@ class Table(Canvas):
         if df.index.name is None or df.index.names[0] is None:
             drop = messagebox.askyesno("Reset Index", "Drop the index?",
                                       parent=self.parentframe)
-        self.model.df.reset_index(drop=drop, inplace=True)
+        self.model.resetIndex(drop=drop)
         #self.update_rowcolors()
         self.set_rowcolors_index()
-        self.redraw()
+        self.scheduleRedraw()
         #self.drawSelectedCol()
-        if hasattr(self, 'pf'):
-            self.pf.updateData()
-        self.tableChanged()
+        self.tableChanged(cols=[])
         return
 
     def flattenIndex(self):
@@ -925,7 +1504,33 @@ class Table(Canvas):
     def set_rowcolors_index(self):
         df = self.model.df
         if len(self.rowcolors) == len(df):
-            self.rowcolors.set_index(df.index, inplace=True)
+            self.rowcolors.setIndex(df.index)
+
+    def alignRows(self, indexer, oldindex):
+        """Keep row colors and the row selection with their rows after
+        rows were inserted, deleted or sorted by position.
+        Args:
+            indexer: old position of each row now in the table, -1 for
+                new rows, as returned by the model
+            oldindex: the table index before the change
+        """
+
+        df = self.model.df
+        rc = self.rowcolors
+        if indexer is None:
+            self.update_rowcolors()
+            return
+        if len(rc) == len(oldindex) and rc.getIndexer(oldindex) is None:
+            rc.takeRows(indexer, df.index)
+        else:
+            self.update_rowcolors()
+        self.multiplerowlist = self.multiplerowlist.remap(indexer)
+        pos = np.flatnonzero(indexer == self.currentrow)
+        if len(pos) > 0:
+            self.currentrow = int(pos[0])
+        else:
+            self.currentrow = max(min(self.currentrow, len(df)-1), 0)
+        return
 
     def update_rowcolors(self):
         """Update row colors if present"""
@@ -933,7 +1538,7 @@ class Table(Canvas):
         df = self.model.df
         if len(df)>len(self.rowcolors):
             idx = df.index.difference(self.rowcolors.index)
-            self.rowcolors = self.rowcolors.append(pd.DataFrame(index=idx))
+            self.rowcolors.append(idx)
 
         #print (self.rowcolors)
         return
@@ -943,24 +1548,50 @@ class Table(Canvas):
 
         self.xview(*args)
         self.tablecolheader.xview(*args)
-        self.redrawVisible()
+        #dragging the scrollbar sends moveto for every motion event
+        self.scheduleRedraw('view', throttle=args[0]=='moveto')
         return
 
     def set_yviews(self,*args):
         """Set the xview of table and row header"""
 
+        if self.isVirtual():
+            #move the page start instead of scrolling the canvas
+            page = self.getPageRows()
+            if args[0] == 'moveto':
+                row = float(args[1])*self.rows
+            elif args[2] == PAGES:
+                row = self.rowoffset+int(args[1])*page
+            else:
+                #same step as the default canvas scroll increment
+                row = self.rowoffset+int(args[1])*max(int(page/10),1)
+            self.setRowOffset(row)
+            self.set_yscrollbar(0, 1)
+            self.scheduleRedraw(throttle=args[0]=='moveto')
+            return
         self.yview(*args)
         self.rowheader.yview(*args)
-        self.redrawVisible()
+        self.scheduleRedraw('view', throttle=args[0]=='moveto')
+        return
+
+    def set_yscrollbar(self, first, last):
+        """Update the vertical scrollbar, from the row offset in
+        virtual mode"""
+
+        if self.isVirtual():
+            first, last = self.getVirtualView()
+        self.Yscrollbar.set(first, last)
         return
 
     def addRow(self):
         """Insert a new row"""
 
         row = self.getSelectedRow()
-        key = self.model.addRow(row)
+        oldindex = self.model.df.index
+        indexer = self.model.addRow(row)
+        self.alignRows(indexer, oldindex)
         self.redraw()
-        self.tableChanged()
+        self.tableChanged(cols=[])
         return
 
     def addRows(self, num=None):
@@ -973,10 +1604,11 @@ class Table(Canvas):
         if not num:
             return
         self.storeCurrent()
-        keys = self.model.autoAddRows(num)
+        oldindex = self.model.df.index
+        indexer = self.model.autoAddRows(num)
+        self.alignRows(indexer, oldindex)
         self.redraw()
-        self.tableChanged()
-        self.update_rowcolors()
+        self.tableChanged(cols=[])
         return
 
     def addColumn(self, newname=None):
@@ -1019,7 +1651,9 @@ class Table(Canvas):
             if n == True:
                 self.storeCurrent()
                 rows = self.multiplerowlist
-                self.model.deleteRows(rows)
+                oldindex = self.model.df.index
+                indexer = self.model.deleteRows(rows)
+                self.alignRows(indexer, oldindex)
                 self.setSelectedRow(0)
                 self.clearSelected()
                 self.redraw()
@@ -1030,7 +1664,9 @@ class Table(Canvas):
             if n:
                 self.storeCurrent()
                 row = self.getSelectedRow()
-                self.model.deleteRows([row])
+                oldindex = self.model.df.index
+                indexer = self.model.deleteRows([row])
+                self.alignRows(indexer, oldindex)
                 self.setSelectedRow(row-1)
                 self.clearSelected()
                 self.redraw()
@@ -1040,9 +1676,7 @@ class Table(Canvas):
         """Make copy of rows"""
 
         rows = self.multiplerowlist
-        df = self.model.df
-        d = df.iloc[rows]
-        self.model.df = pd.concat([df, d])
+        self.model.duplicateRows(rows)
         self.redraw()
         return
 
@@ -1078,7 +1712,7 @@ class Table(Canvas):
         df[new] = df[name]
         self.placeColumn(new, name)
         #self.redraw()
-        self.tableChanged()
+        self.tableChanged(cols=[new])
         return
 
     def moveColumns(self, names=None, pos='start'):
@@ -1098,10 +1732,12 @@ class Table(Canvas):
         self.tableChanged()
         return
 
-    def tableChanged(self):
+    def tableChanged(self, cols=None):
         """Callback to be used when dataframe changes so that other
-            widgets and data can be updated"""
+            widgets and data can be updated. cols are the names of
+            columns whose values changed, None if anything changed"""
 
+        self.model.dataChanged(cols=cols)
         self.updateFunctions()
         self.updateWidgets()
         if hasattr(self, 'pf'):
@@ -1213,7 +1849,7 @@ class Table(Canvas):
         col = df.columns[self.currentcol]
         df[col] = data
         self.redraw()
-        self.tableChanged()
+        self.tableChanged(cols=[col])
         return
 
     def autoAddColumns(self, numcols=None):
@@ -1245,6 +1881,7 @@ class Table(Canvas):
         t = d.results[0]
         try:
             self.model.df[col] = df[col].astype(t)
+            self.model.dataChanged(cols=[col])
             self.redraw()
         except:
             logging.error("Exception occurred", exc_info=True)
@@ -1382,6 +2019,8 @@ class Table(Canvas):
             df[name] = pd.cut(df[col], bins, labels=binlabels)
         else:
             df[name] = df[col].astype('category')
+        if dummies != 1:
+            self.model.dataChanged(cols=[name])
         if name != col:
             self.placeColumn(name, col)
         else:
@@ -1448,6 +2087,7 @@ class Table(Canvas):
             if inplace == True:
                 newcol = cols[0]
             df[newcol] = df[cols].apply(func, 1)
+        self.model.dataChanged(cols=[newcol])
         if inplace == False:
             self.placeColumn(newcol,cols[-1])
         else:
@@ -1501,8 +2141,10 @@ class Table(Canvas):
         name = col+suffix
         if inplace == True:
             df[col] = new
+            self.model.dataChanged(cols=[col])
         else:
             df[name] = new
+            self.model.dataChanged(cols=[name])
             self.placeColumn(name, cols[-1])
         self.redraw()
         return
@@ -1621,6 +2263,7 @@ class Table(Canvas):
         else:
             newcol = col
         df[newcol] = x
+        self.model.dataChanged(cols=[newcol])
         if inplace == 0:
             self.placeColumn(newcol,col)
         self.redraw()
@@ -1679,18 +2322,29 @@ class Table(Canvas):
             self.placeColumn(colname, cols[-1])
 
         self.redraw()
-        self.tableChanged()
+        self.tableChanged(cols=[colname])
         return
 
     def showAll(self):
         """Re-show unfiltered"""
 
-        if hasattr(self, 'dataframe'):
-            self.model.df = self.dataframe
+        self.model.setRowFilter(None)
         self.filtered = False
         self.redraw()
         return
 
+    def filterRows(self, mask):
+        """Show only the rows where mask is True. The mask is over the
+        rows of model.getUnfiltered(), the filter is applied to them in
+        their current sort order."""
+
+        self.model.setRowFilter(mask)
+        self.delete('rowrect')
+        self.multiplerowlist = []
+        self.currentrow = 0
+        self.filtered = True
+        return
+
     def statsViewer(self):
         """Show model fitting dialog"""
 
@@ -1782,6 +2436,7 @@ class Table(Canvas):
         #evaluate
         try:
             df[n] = self._eval(df, ex)
+            self.model.dataChanged(cols=[n])
             self.functionentry.configure(style="White.TCombobox")
         except Exception as e:
             print ('function parse error')
@@ -1810,18 +2465,52 @@ class Table(Canvas):
         and dependent on other columns (except self derived?)"""
 
         df = self.model.df
+        changed = []
         for n in self.formulae:
             if n==omit: continue
             ex = self.formulae[n]
             #need to check if self calculation here...
             try:
                 df[n] = self._eval(df, ex)
+                changed.append(n)
             except:
                 logging.error("Exception occurred", exc_info=True)
                 print('could not calculate %s' %ex)
+        if len(changed) > 0:
+            self.model.dataChanged(cols=changed)
         self.redraw()
         return
 
+    def recalculateDependents(self, colname):
+        """Re evaluate only the function columns whose expressions use
+        colname, directly or through other function columns.
+        Returns the names of the columns recalculated."""
+
+        formulae = getattr(self, 'formulae', {})
+        if len(formulae) == 0:
+            return []
+        df = self.model.df
+        changed = []
+        check = [str(colname)]
+        while len(check) > 0:
+            c = check.pop(0)
+            for n in formulae:
+                if n in changed or n == c:
+                    continue
+                if c not in re.findall(r'[A-Za-z_]\w*', formulae[n]):
+                    continue
+                try:
+                    df[n] = self._eval(df, formulae[n])
+                except:
+                    logging.error("Exception occurred", exc_info=True)
+                    print('could not calculate %s' %formulae[n])
+                    continue
+                changed.append(n)
+                check.append(n)
+        if len(changed) > 0:
+            self.model.dataChanged(cols=changed)
+        return changed
+
     def updateFunctions(self):
         """Remove functions if a column has been deleted"""
 
@@ -1956,24 +2645,17 @@ class Table(Canvas):
         #get coord on canvas, not window, need this if scrolling
         y = int(self.canvasy(event.y))
         y_start=self.y_start
-        rowc = int((int(y)-y_start)/h)
+        rowc = int((int(y)-y_start)/h) + self.rowoffset
         return rowc
 
     def get_col_clicked(self,event):
         """Get column where event on the canvas occurs"""
 
-        w = self.cellwidth
         x = int(self.canvasx(event.x))
-        x_start = self.x_start
-        for colpos in self.col_positions:
-            try:
-                nextpos = self.col_positions[self.col_positions.index(colpos)+1]
-            except:
-                nextpos = self.tablewidth
-            if x > colpos and x <= nextpos:
-                #print 'x=', x, 'colpos', colpos, self.col_positio.drawSelectedRectns.index(colpos)
-                return self.col_positions.index(colpos)
-        return
+        col = np.searchsorted(self.col_positions, x, side='left')-1
+        if col < 0 or col >= len(self.col_positions)-1:
+            return
+        return int(col)
 
     def setSelectedRow(self, row):
         """Set currently selected row and reset multiple row list"""
@@ -2001,10 +2683,8 @@ class Table(Canvas):
             return
         if endrow > self.rows or endcol > self.cols:
             return
-        for r in range(startrow, endrow):
-            self.multiplerowlist.append(r)
-        for c in range(startcol, endcol):
-            self.multiplecollist.append(c)
+        self.multiplerowlist.extend(range(startrow, endrow))
+        self.multiplecollist.extend(range(startcol, endcol))
         return
 
     def getSelectedRow(self):
@@ -2020,11 +2700,11 @@ class Table(Canvas):
 
         self.startrow = 0
         self.endrow = self.rows
-        self.multiplerowlist = list(range(self.startrow,self.endrow))
+        self.multiplerowlist = range(self.startrow,self.endrow)
         self.drawMultipleRows(self.multiplerowlist)
         self.startcol = 0
         self.endcol = self.cols
-        self.multiplecollist = list(range(self.startcol, self.endcol))
+        self.multiplecollist = range(self.startcol, self.endcol)
         self.drawMultipleCells()
         return
 
@@ -2041,19 +2721,16 @@ class Table(Canvas):
     def getCellCoords(self, row, col):
         """Get x-y coordinates to drawing a cell in a given row/col"""
 
-        colname=self.model.getColumnName(col)
-        if colname in self.columnwidths:
-            w=self.columnwidths[colname]
-        else:
-            w=self.cellwidth
         h=self.rowheight
-        x_start=self.x_start
-        y_start=self.y_start
+        y_start = self.getRowOrigin()
 
         #get nearest rect co-ords for that row/col
         x1=self.col_positions[col]
         y1=y_start+h*row
-        x2=x1+w
+        if col+1 < len(self.col_positions):
+            x2=self.col_positions[col+1]
+        else:
+            x2=x1+self.cellwidth
         y2=y1+h
         return x1,y1,x2,y2
 
@@ -2064,13 +2741,15 @@ class Table(Canvas):
             return None, None
         x1,y1,x2,y2 = self.getCellCoords(row,col)
         cx=float(x1)/self.tablewidth
-        cy=float(y1)/(self.rows*self.rowheight)
+        #fraction of the whole table, not the canvas page
+        cy=float(self.y_start+self.rowheight*row)/(self.rows*self.rowheight)
         return cx, cy
 
     def isInsideTable(self,x,y):
         """Returns true if x-y coord is inside table bounds"""
 
-        if self.x_start < x < self.tablewidth and self.y_start < y < self.rows*self.rowheight:
+        y1, y2 = self.getRowExtent()
+        if self.x_start < x < self.tablewidth and y1 < y < y2:
             return 1
         else:
             return 0
@@ -2233,26 +2912,22 @@ class Table(Canvas):
         else:
             self.endcol = colover
             if self.endcol < self.startcol:
-                self.multiplecollist=list(range(self.endcol, self.startcol+1))
+                self.multiplecollist=range(self.endcol, self.startcol+1)
             else:
-                self.multiplecollist=list(range(self.startcol, self.endcol+1))
+                self.multiplecollist=range(self.startcol, self.endcol+1)
             #print self.multiplecollist
         #draw the selected rows
         if self.endrow != self.startrow:
             if self.endrow < self.startrow:
-                self.multiplerowlist=list(range(self.endrow, self.startrow+1))
+                self.multiplerowlist=range(self.endrow, self.startrow+1)
             else:
-                self.multiplerowlist=list(range(self.startrow, self.endrow+1))
-            self.drawMultipleRows(self.multiplerowlist)
-            self.rowheader.drawSelectedRows(self.multiplerowlist)
-            #draw selected cells outline using row and col lists
-            self.drawMultipleCells()
+                self.multiplerowlist=range(self.startrow, self.endrow+1)
         else:
             self.multiplerowlist = []
             self.multiplerowlist.append(self.currentrow)
-            if len(self.multiplecollist) >= 1:
-                self.drawMultipleCells()
-            self.delete('multiplesel')
+        #motion events can come faster than the display, the selection
+        #is drawn at most maxfps times a second
+        self.scheduleRedraw('selection', throttle=True)
         return
 
     def handle_arrow_keys(self, event):
@@ -2306,8 +2981,7 @@ class Table(Canvas):
             x,y = self.getCanvasPos(self.currentrow-vh, 0)
 
         if self.currentrow >= rmax or self.currentrow <= rmin:
-            self.yview('moveto', y)
-            self.rowheader.yview('moveto', y)
+            self.set_yviews('moveto', y)
             self.redraw()
 
         self.drawSelectedRect(self.currentrow, self.currentcol)
@@ -2371,6 +3045,46 @@ class Table(Canvas):
         self.drawSelectedRect(self.currentrow, self.currentcol)
         return
 
+    def jumpToValue(self, col=None, value=None):
+        """Move to the first row with a value in a column, or the next
+        larger value if none has it. Uses the sorted index of the column."""
+
+        model = self.model
+        if col is None:
+            col = self.currentcol
+        name = model.df.columns[col]
+        if value is None:
+            value = simpledialog.askstring("Jump to value",
+                                           "Find value in %s:" %name,
+                                           parent=self.parentframe)
+            if value is None:
+                return
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        idx = model.getColumnIndex(name, wait=True)
+        if idx is None:
+            return
+        if idx.kind == 'b' and value in ('True', 'False'):
+            value = value == 'True'
+        if not idx.accepts(value):
+            return
+        #where rows of the unfiltered table are shown
+        base, rows = model.getSortBase()
+        positions = None
+        if rows is not None:
+            positions = np.full(len(base), -1)
+            positions[rows] = np.arange(len(rows))
+        try:
+            row = idx.find(value, positions)
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            return
+        self.movetoSelection(row, col)
+        return
+
     def movetoSelection(self, row=None, col=0, idx=None, offset=0):
         """Move to a specific row/col, updating table"""
 
@@ -2384,9 +3098,8 @@ class Table(Canvas):
         x,y = self.getCanvasPos(abs(row-offset), col)
         #print (row,col)
         self.xview('moveto', x)
-        self.yview('moveto', y)
         self.tablecolheader.xview('moveto', x)
-        self.rowheader.yview('moveto', y)
+        self.set_yviews('moveto', y)
         self.rowheader.redraw()
         return
 
@@ -2566,7 +3279,6 @@ class Table(Canvas):
 
         p = pd.pivot_table(df, index=index, columns=column, values=values, aggfunc=func)
         #print (p)
-        self.tableChanged()
         if type(p) is pd.Series:
             p = pd.DataFrame(p)
         self.createChildTable(p, 'pivot-%s-%s' %(index,column), index=True)
@@ -2604,7 +3316,7 @@ class Table(Canvas):
     def describe(self):
         """Create table summary"""
 
-        g = self.model.df.describe()
+        g = self.model.profiler.describe(self.model.df)
         self.createChildTable(g)
         return
 
@@ -2681,7 +3393,7 @@ class Table(Canvas):
             self.model.df[c] = pd.to_numeric(x, errors='coerce').astype(convtype)
 
         self.redraw()
-        self.tableChanged()
+        self.tableChanged(cols=list(colnames))
         return
 
     def corrMatrix(self):
@@ -2755,16 +3467,18 @@ class Table(Canvas):
         """Show dataframe info"""
 
         df = self.model.df
-        import io
-        buf = io.StringIO()
-        df.info(verbose=True,buf=buf,memory_usage=True)
+        s = self.model.profiler.getSummary(df)
+        text = '%s\n%s: %s entries\nData columns (total %s columns):\n' %(
+                    type(df), type(df.index).__name__, len(df), len(df.columns))
+        text += s.to_string() + '\n'
+        text += 'memory usage (estimated): %s\n' %util.formatBytes(s.memory.sum())
         from .dialogs import SimpleEditor
         w = Toplevel(self.parentframe)
         w.grab_set()
         w.transient(self)
         ed = SimpleEditor(w, height=25)
         ed.pack(in_=w, fill=BOTH, expand=Y)
-        ed.text.insert(END, buf.getvalue())
+        ed.text.insert(END, text)
         return
 
     def get_memory(self, ):
@@ -2924,10 +3638,12 @@ class Table(Canvas):
 
         self.storeCurrent()
         df = self.model.df
-        val = df.iloc[rowlist[0],collist[0]]
-        #remove first element as we don't want to overwrite it
-        rowlist.remove(rowlist[0])
-        df.iloc[rowlist,collist] = val
+        rows = np.asarray(rowlist, dtype=int)
+        cols = np.asarray(collist, dtype=int)
+        val = df.iloc[rows[0],cols[0]]
+        #leave out the first row as we don't want to overwrite it
+        df.iloc[rows[1:],cols] = val
+        self.model.dataChanged(cols=df.columns[cols])
         self.redraw()
         return
 
@@ -2953,18 +3669,18 @@ class Table(Canvas):
             return None
         #if only one row selected we plot whole col
         if len(rows) == 1:
-            rows = self.rowrange
+            rows = slice(None)
+        else:
+            rows = rows.getIndexer()
+        df = model.df
         lists = []
-
         for c in cols:
-            x=[]
-            for r in rows:
-                #absr = self.get_AbsoluteRow(r)
-                val = model.getValueAt(r,c)
-                if val == None or val == '':
-                    continue
-                x.append(val)
-            lists.append(x)
+            #take the block of values at once and leave out empty ones
+            x = df.iloc[rows,c]
+            mask = x.notna()
+            if x.dtype == 'object':
+                mask &= x != ''
+            lists.append(x[mask].tolist())
         return lists
 
     def showPlotViewer(self, parent=None, layout='horizontal'):
@@ -2994,13 +3710,14 @@ class Table(Canvas):
 
         df = self.model.df
         rows = self.multiplerowlist
-        if not type(rows) is list:
-            rows = list(rows)
+        #contiguous selections are sliced so no positions are created
         if len(rows)<1 or self.allrows == True:
-            rows = list(range(self.rows))
-        cols = self.multiplecollist
+            rows = slice(None)
+        else:
+            rows = rows.getIndexer()
+        cols = self.multiplecollist.getIndexer()
         try:
-            data = df.iloc[list(rows),cols]
+            data = df.iloc[rows,cols]
         except Exception as e:
             print ('error indexing data')
             logging.error("Exception occurred", exc_info=True)
@@ -3053,25 +3770,41 @@ class Table(Canvas):
     def drawGrid(self, startrow, endrow):
         """Draw the table grid lines"""
 
-        self.delete('gridline','text')
-        rows=len(self.rowrange)
+        self.delete('gridline')
         cols=self.cols
-        w = self.cellwidth
+        if len(self.visiblecols) > 0:
+            self.drawVertLines(self.visiblecols[0], self.visiblecols[-1]+2)
+        self.drawHorizLines(startrow, endrow+1)
+        return
+
+    def drawVertLines(self, start, end):
+        """Draw the vertical grid lines at the left edges of columns start
+        to end, end may be one past the last column"""
+
+        if self.vertlines != 1:
+            return
+        y1, y2 = self.getRowExtent()
+        for col in range(start, min(end, self.cols+1)):
+            x=self.col_positions[col]
+            self.create_line(x,y1,x,y2,
+                             tag=('gridline','vline'+str(col)),
+                             fill=self.grid_color, width=self.linewidth)
+        return
+
+    def drawHorizLines(self, start, end):
+        """Draw the horizontal grid lines at the top edges of rows start
+        to end"""
+
+        if self.horizlines != 1:
+            return
         h = self.rowheight
         x_start=self.x_start
-        y_start=self.y_start
-        x_pos=x_start
-
-        if self.vertlines==1:
-            for col in range(cols+1):
-                x=self.col_positions[col]
-                self.create_line(x,y_start,x,y_start+rows*h, tag='gridline',
-                                     fill=self.grid_color, width=self.linewidth)
-        if self.horizlines==1:
-            for row in range(startrow, endrow+1):
-                y_pos=y_start+row*h
-                self.create_line(x_start,y_pos,self.tablewidth,y_pos, tag='gridline',
-                                    fill=self.grid_color, width=self.linewidth)
+        y_start = self.getRowOrigin()
+        for row in range(start, end):
+            y_pos=y_start+row*h
+            self.create_line(x_start,y_pos,self.tablewidth,y_pos,
+                             tag=('gridline','hline'+str(row)),
+                             fill=self.grid_color, width=self.linewidth)
         return
 
     def drawRowHeader(self):
@@ -3103,6 +3836,8 @@ class Table(Canvas):
         if col >= self.cols:
             return
         self.delete('currentrect')
+        if self.isVirtual() and row not in self.visiblerows:
+            return
         if color == None:
             color = 'gray25'
         w=2
@@ -3143,17 +3878,32 @@ class Table(Canvas):
         """Callback for cell entry"""
 
         value = self.cellentryvar.get()
-        if self.filtered == 1:
-            df = self.dataframe
-        else:
-            df = None
-        self.model.setValueAt(value,row,col,df=df)
-
-        self.drawText(row, col, value, align=self.align)
+        self.setCellValue(value, row, col)
         self.delete('entry')
         self.gotonextCell()
         return
 
+    def setCellValue(self, value, row, col, df=None):
+        """Set the value of one cell from an edit. Only that cell and the
+        formula columns that depend on it are redrawn."""
+
+        model = self.model
+        version = model.version
+        model.setValueAt(value, row, col, df=df)
+        colname = model.df.columns[col]
+        changed = self.recalculateDependents(colname)
+        cols = [model.df.columns.get_loc(c) for c in changed]
+        #formatted pages not holding the changed cells are still valid
+        self._pagecache.changeCells(version, model.version, [(row, col)], cols)
+        if colname in self.colorrules or \
+            len([c for c in changed if c in self.colorrules]) > 0:
+            self.scheduleRedraw()
+            return
+        self.scheduleRedraw('cells', [(row, col)])
+        if len(cols) > 0:
+            self.scheduleRedraw('cols', cols)
+        return
+
     def handleEntryMenu(self, *args):
         """Callback for option menu in categorical columns entry"""
 
@@ -3162,10 +3912,9 @@ class Table(Canvas):
         row = self.currentrow
         col = self.currentcol
         try:
-            self.model.setValueAt(value,row,col)
+            self.setCellValue(value, row, col)
         except:
-            self.model.setValueAt(float(value),row,col)
-        self.drawText(row, col, value, align=self.align)
+            self.setCellValue(float(value), row, col)
         return
 
     def drawCellEntry(self, row, col, text=None):
@@ -3212,10 +3961,60 @@ class Table(Canvas):
             return 1
         return 1
 
+    def getCellSlot(self, row, col):
+        """Get the screen slot of a visible cell, used to key pooled canvas
+        items. Slots wrap around by the pool size so that a cell keeps its
+        slot while the view scrolls."""
+
+        rows, cols = self._textpoolshape
+        return row % rows, col % cols
+
+    def setTextPoolSize(self, rows, cols):
+        """Grow the text pool so it has a slot for every cell of a view
+        of the given size"""
+
+        prows, pcols = self._textpoolshape
+        if rows > prows or cols > pcols:
+            self._textpoolshape = (max(rows,prows), max(cols,pcols))
+        return
+
+    def clearTextPool(self):
+        """Remove all pooled cell text items"""
+
+        self.delete('text')
+        self._textpool = {}
+        self._textpoolshape = (0,0)
+        self._textslots = {}
+        return
+
+    def drawCellText(self, rows, cols):
+        """Format and draw the text for a block of cells. rows and cols
+        are contiguous positions."""
+
+        if len(rows) == 0 or len(cols) == 0:
+            return
+        df = self.model.df
+        cfa = self.columnformats['alignment']
+        #format the block, or take it from cached pages, then place the strings
+        celltext = self._pagecache.getBlock(df, self.model.version, rows, cols,
+                                            self.floatprecision)
+        for j in range(len(cols)):
+            col = cols[j]
+            colname = df.columns[col]
+            if colname in cfa:
+                align = cfa[colname]
+            else:
+                align = self.align
+            coltext = celltext[:,j]
+            for i in range(len(rows)):
+                self.drawText(rows[i], col, coltext[i], align)
+        return
+
     def drawText(self, row, col, celltxt, align=None):
-        """Draw the text inside a cell area"""
+        """Draw the text inside a cell area. Text items are pooled per screen
+        slot, so an existing item is moved and updated rather than deleted
+        and created again."""
 
-        self.delete('celltext'+str(col)+'_'+str(row))
         h = self.rowheight
         x1,y1,x2,y2 = self.getCellCoords(row,col)
         w=x2-x1
@@ -3225,13 +4024,17 @@ class Table(Canvas):
         #    celltxt = np.round(celltxt,3)
         celltxt = str(celltxt)
         length = len(celltxt)
-        if length == 0:
+        #only cells in view have a slot
+        if not self.visiblerows[0] <= row <= self.visiblerows[-1] or \
+           not self.visiblecols[0] <= col <= self.visiblecols[-1]:
             return
-
-        if w<=10:
-            return
-        if w < 18:
-            celltxt = '.'
+        slot = self.getCellSlot(row, col)
+        item = self._textpool.get(slot)
+        #empty and very narrow cells show nothing
+        if length == 0 or w < 18:
+            if item is not None:
+                self.itemconfigure(item, state='hidden', tags='text')
+                self._textslots.pop(slot, None)
             return
 
         fgcolor = self.textcolor
@@ -3246,13 +4049,22 @@ class Table(Canvas):
         width=0
         celltxt = celltxt[0:int(newlength)]
         y=y1+h/2
-        rect = self.create_text(x1+w/2,y,
+        tags = ('text','celltext'+str(col)+'_'+str(row))
+        if item is None:
+            item = self.create_text(x1+w/2,y,
                                   text=celltxt,
                                   fill=fgcolor,
                                   font=self.thefont,
                                   anchor=align,
-                                  tag=('text','celltext'+str(col)+'_'+str(row)),
+                                  tag=tags,
                                   width=width)
+            self._textpool[slot] = item
+        else:
+            self.coords(item, x1+w/2, y)
+            self.itemconfigure(item, text=celltxt, fill=fgcolor,
+                               font=self.thefont, anchor=align,
+                               tags=tags, state='normal')
+        self._textslots[slot] = (row,col)
         return
 
     def drawSelectedRow(self):
@@ -3260,6 +4072,10 @@ class Table(Canvas):
 
         self.delete('rowrect')
         row = self.currentrow
+        if self.isVirtual() and row not in self.visiblerows:
+            #only rows on the current page are drawn
+            self.rowheader.drawSelectedRows(row)
+            return
         x1,y1,x2,y2 = self.getCellCoords(row,0)
         x2 = self.tablewidth
         rect = self.create_rectangle(x1,y1,x2,y2,
@@ -3285,7 +4101,7 @@ class Table(Canvas):
             col = self.currentcol
         w=2
         x1,y1,x2,y2 = self.getCellCoords(0,col)
-        y2 = self.rows * self.rowheight
+        y1, y2 = self.getRowExtent()
         rect = self.create_rectangle(x1+w/2,y1+w/2,x2,y2+w/2,
                                      width=w,fill=color,outline='',
                                      tag=tag)
@@ -3294,28 +4110,42 @@ class Table(Canvas):
         return
 
     def drawMultipleRows(self, rowlist):
-        """Draw more than one row selection"""
+        """Draw more than one row selection. One rectangle is drawn for
+        each run of selected rows and columns of the same color, existing
+        rectangles are moved rather than recreated."""
 
-        self.delete('multiplesel')
-        #self.delete('rowrect')
         cols = self.visiblecols
-        rows = list(set(rowlist) & set(self.visiblerows))
-        if len(rows)==0:
+        v = self.visiblerows
+        if len(v) == 0 or len(cols) == 0:
+            self.delete('multiplesel')
             return
+        runs = RangeList(rowlist).intersect(v[0], v[-1]+1)
+        #group visible columns into runs of the same fill color
+        df = self.model.df
+        colruns = []
         for col in cols:
-            colname = self.model.df.columns[col]
+            colname = df.columns[col]
             #if col is colored we darken it
             if colname in self.columncolors:
                 clr = self.columncolors[colname]
                 clr = util.colorScale(clr, -30)
             else:
                 clr = self.rowselectedcolor
-            for r in rows:
-                x1,y1,x2,y2 = self.getCellCoords(r,col)
-                rect = self.create_rectangle(x1,y1,x2,y2,
-                                          fill=clr,
-                                          outline=self.rowselectedcolor,
-                                          tag=('multiplesel','rowrect'))
+            if len(colruns) > 0 and colruns[-1][2] == clr:
+                colruns[-1][1] = col
+            else:
+                colruns.append([col, col, clr])
+        rects = []
+        for a,b in runs:
+            for c0,c1,clr in colruns:
+                x1,y1,x,y = self.getCellCoords(a,c0)
+                x,y,x2,y2 = self.getCellCoords(b-1,c1)
+                rects.append((x1,y1,x2,y2, {'fill':clr,
+                              'outline':self.rowselectedcolor,
+                              'tags':('multiplesel','rowrect')}))
+        util.updateRectangles(self, 'multiplesel', rects)
+        if len(rects)==0:
+            return
         self.lower('multiplesel')
         self.lower('fillrect')
         self.lower('colorrect')
@@ -3332,17 +4162,40 @@ class Table(Canvas):
         """Draw an outline box for multiple cell selection"""
 
         self.delete('currentrect')
-        self.delete('multicellrect')
         rows = self.multiplerowlist
         cols = self.multiplecollist
         if len(rows) == 0 or len(cols) == 0:
+            self.delete('multicellrect')
             return
         w=2
-        x1,y1,a,b = self.getCellCoords(rows[0],cols[0])
-        c,d,x2,y2 = self.getCellCoords(rows[len(rows)-1],cols[len(cols)-1])
-        rect = self.create_rectangle(x1+w/2,y1+w/2,x2,y2,
-                             outline=self.boxoutlinecolor, width=w,
-                             tag='multicellrect')
+        #clip the rows to the page drawn, just past its edges so the
+        #outline of rows off the page is not shown
+        top, bottom = self.getRowExtent()
+        y0 = self.getRowOrigin()
+        y1 = max(y0+rows[0]*self.rowheight, top-w)
+        y2 = min(y0+(rows[-1]+1)*self.rowheight, bottom+w)
+        if y1 >= y2:
+            self.delete('multicellrect')
+            return
+        x1,a,b,c = self.getCellCoords(0,cols[0])
+        a,b,x2,c = self.getCellCoords(0,cols[-1])
+        util.updateRectangles(self, 'multicellrect', [(x1+w/2,y1+w/2,x2,y2,
+                             {'outline':self.boxoutlinecolor, 'width':w,
+                              'tags':'multicellrect'})])
+        return
+
+    def drawSelection(self):
+        """Draw the multiple row and cell selection, used when
+        the selection changes while dragging"""
+
+        rows = self.multiplerowlist
+        if len(rows) > 1:
+            self.drawMultipleRows(rows)
+        else:
+            self.delete('multiplesel')
+        self.rowheader.drawSelectedRows(rows)
+        if len(self.multiplecollist) >= 1:
+            self.drawMultipleCells()
         return
 
     def setcellbackgr(self):
@@ -3415,8 +4268,9 @@ class Table(Canvas):
         self.rows = self.model.getRowCount()
         self.cols = self.model.getColumnCount()
         self.tablewidth = (self.cellwidth)*self.cols
-        self.tablecolheader.model = model
-        self.rowheader.model = model
+        self.tablecolheader.model = self.model
+        self.rowheader.model = self.model
+        self.rowindexheader.model = self.model
         self.tableChanged()
         self.adjustColumnWidths()
         #if hasattr(self, 'tablecolheader'):
@@ -3555,7 +4409,8 @@ class Table(Canvas):
     def clearFormatting(self):
         self.set_defaults()
         self.columncolors = {}
-        self.rowcolors = pd.DataFrame()
+        self.rowcolors = formatting.RowColors()
+        self.colorrules = {}
         self.columnformats['alignment'] = {}
         self.redraw()
         return
@@ -3653,6 +4508,11 @@ class statusBar(Frame):
         l=Label(self,textvariable=self.colsvar,font=sfont,foreground=clr)
         l.pack(fill=X, side=LEFT)
         Label(self,text='columns',font=sfont,foreground=clr).pack(side=LEFT)
+        self.memvar = StringVar()
+        #data version the memory was summed for
+        self.memversion = None
+        l=Label(self,textvariable=self.memvar,font=sfont)
+        l.pack(fill=X, side=LEFT, padx=4)
         self.filenamevar = StringVar()
         l=Label(self,textvariable=self.filenamevar,font=sfont)
         l.pack(fill=X, side=RIGHT)
@@ -3675,6 +4535,28 @@ class statusBar(Frame):
         model = self.parentapp.model
         self.rowsvar.set(len(model.df))
         self.colsvar.set(len(model.df.columns))
+        #only sum again when the data changed, not on every paint
+        if self.memversion != model.version:
+            self.updateMemory()
         if self.parentapp.filename != None:
             self.filenamevar.set(self.parentapp.filename)
         return
+
+    def updateMemory(self):
+        """Memory from profiles that are ready, the rest are made in the
+        background and summed again when they are done"""
+
+        model = self.parentapp.model
+        profiles = model.profiler.getProfiles(model.df)
+        missing = [c for c in profiles if profiles[c] is None]
+        mem = sum(profiles[c]['memory'] for c in profiles if profiles[c] is not None)
+        if len(missing) > 0:
+            model.profiler.request(model.df, missing)
+            if model.profiler.isBusy():
+                #columns that failed are not waited for
+                self.parentapp.waitForProfiles()
+            self.memvar.set('>%s' %util.formatBytes(mem))
+        else:
+            self.memvar.set(util.formatBytes(mem))
+        self.memversion = model.version
+        return
@@ -25,10 +25,22 @@ from types import *
 import operator
 import os, string, types, copy
 import pickle
+import itertools
+import threading
+import weakref
+import datetime
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 import numpy as np
 import pandas as pd
 from . import util
 
+#data versions, unique across models
+VERSIONS = itertools.count(1)
+
 class TableModel(object):
     """A data model for the Table class that uses pandas
 
@@ -78,7 +90,15 @@ class TableModel(object):
             cols=int(1e5)
         n=2
         if cols>100: n=3
-        colnames = [genstr(n) for i in range(cols)]
+        #unique names while there are enough of them
+        colnames = []
+        used = set()
+        while len(colnames) < min(cols, len(s)**n):
+            c = genstr(n)
+            if c not in used:
+                used.add(c)
+                colnames.append(c)
+        colnames += [genstr(n) for i in range(cols-len(colnames))]
         coldata = [np.random.normal(x,1,rows) for x in np.random.normal(5,3,cols)]
         n = np.array(coldata).T
         df = pd.DataFrame(n, columns=colnames)
@@ -119,8 +139,112 @@ class TableModel(object):
         """Create meta data fields"""
         self.meta = {}
         #self.columnwidths = {} #used to store col widths
+        self.version = 0
+        self.profiler = ColumnProfiler()
+        self.indexer = ColumnIndexer()
+        #versions of column values, see getColumnVersion
+        self._colepoch = 0
+        self._colversions = {}
+        #column arrays for scalar access and the data they were taken from
+        self._arrays = {}
+        self._arraykey = None
+        #table with spare rows for appending and the slice of it in use
+        self._rowbuffer = None
+        #unsorted table, positions of the rows shown and the version
+        #they match, with the sort order and filter giving those rows
+        self._sortbase = None
+        self._sortorder = None
+        self._rowfilter = None
+        #row permutations of the unsorted table by sort key
+        self._sortcache = OrderedDict()
+        return
+
+    @property
+    def df(self):
+        """The dataframe, setting it counts as a data change"""
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.dataChanged()
+
+    def dataChanged(self, cols=None):
+        """Mark the data as changed so that anything computed from it,
+        such as formatting rule stats, is recomputed.
+        Args:
+            cols: names of columns whose values changed, None for all
+        """
+
+        #values changed in the rows shown since they were taken from
+        #the unsorted table are copied to it so the order can be restored
+        sb = self.getCurrentBase(rebase=cols is None)
+        shown = self._sortbase is not None and self._sortbase[1] is not None
+        self.version = next(VERSIONS)
+        self.profiler.invalidate(cols)
+        if cols is None:
+            self._colepoch = self.version
+            self._colversions = {}
+        else:
+            for c in cols:
+                self._colversions[c] = self.version
+        if cols is not None and len(cols) == 0:
+            return
+        self.clearCache()
+        if sb is not None and cols is None and shown:
+            kept = self.setBaseFrame(sb)
+        elif sb is not None and cols is not None:
+            kept = self.setBaseColumns(cols)
+            if kept:
+                self._sortbase = sb[:2] + (self.getSortKey(),)
+        else:
+            kept = not shown
+        if not kept:
+            #the rows shown can't be matched to the unfiltered table so
+            #they become it, rather than losing changes made to them
+            self.releaseRows()
+        return
+
+    def getColumnVersion(self, col=None):
+        """Version of the values in a column by name, or of the whole
+        table if col is None. Changes when values are edited, but not
+        when rows are only sorted or filtered."""
+
+        if col is None:
+            last = max(self._colversions.values()) if self._colversions else 0
+            return (self._colepoch, last)
+        return (self._colepoch, self._colversions.get(col, 0))
+
+    def clearCache(self):
+        """Drop cached column arrays, e.g. after columns were replaced"""
+
+        self._arrays = {}
         return
 
+    def getColumnArray(self, col):
+        """Values of a column by position, cached for fast scalar access.
+        Numpy columns give a view of their data, others their pandas array
+        so that values are the same as from iloc. The cache is dropped when
+        the dataframe, its columns or its internal blocks are replaced."""
+
+        df = self.df
+        mgr = df._mgr
+        blocks = getattr(mgr, 'blocks', mgr)
+        key = self._arraykey
+        if key is None or key[0] is not df or key[1] is not df.columns \
+            or key[2] is not blocks:
+            self._arrays = {}
+            self._arraykey = (df, df.columns, blocks)
+        arr = self._arrays.get(col)
+        if arr is None:
+            column = df.iloc[:,col]
+            if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biufcO':
+                arr = column.to_numpy()
+            else:
+                arr = column.array
+            self._arrays[col] = arr
+        return arr
+
     def save(self, filename):
         """Save dataframe"""
 
@@ -179,7 +303,11 @@ class TableModel(object):
         name = cols[oldindex]
         del cols[oldindex]
         cols.insert(newindex, name)
-        self.df = df[cols]
+        sb = self.getCurrentBase()
+        #column values are unchanged so profiles are kept
+        self._df = df[cols]
+        self.dataChanged(cols=[])
+        self.setBaseOrder(sb)
         return
 
     def autoAddRows(self, num):
@@ -189,24 +317,91 @@ class TableModel(object):
         df = self.df
         if len(df) == 0:
             self.df = pd.DataFrame(pd.Series(range(num)))
-            print (df)
             return
+        return self.appendRows(num)
+
+    def addRow(self, rowindex):
+        """Inserts a row at the required position"""
+
+        return self.insertRows([rowindex])
+
+    def getNewIndex(self, index, indexer):
+        """Index for rows taken from index at the indexer positions. New
+        rows (-1) get labels after the largest label of a numeric index,
+        or missing labels for other index types."""
+
+        new = indexer < 0
+        if isinstance(index, pd.MultiIndex) or \
+            not pd.api.types.is_numeric_dtype(index.dtype):
+            return index.take(indexer, allow_fill=True, fill_value=np.nan)
         try:
-            ind = self.df.index.max()+1
+            start = int(index.max())+1
         except:
-            ind = len(df)+1
-        new = pd.DataFrame(np.nan, index=range(ind,ind+num), columns=df.columns)
-        self.df = pd.concat([df, new])
-        return
+            start = len(index)+1
+        vals = index.to_numpy()[np.where(new, 0, indexer)] if len(index) > 0 \
+                else np.zeros(len(indexer), dtype=int)
+        vals[new] = np.arange(start, start+new.sum())
+        return pd.Index(vals, name=index.name)
+
+    def takeRows(self, df, indexer):
+        """New dataframe with the rows at the indexer positions, -1 for
+        new empty rows. Each column is copied once."""
+
+        from pandas.api.extensions import take
+        data = {}
+        for i in range(len(df.columns)):
+            column = df.iloc[:,i]
+            if isinstance(column.dtype, np.dtype):
+                vals = column.to_numpy()
+            else:
+                vals = column.array
+            data[i] = take(vals, indexer, allow_fill=True)
+        new = pd.DataFrame(data, index=self.getNewIndex(df.index, indexer),
+                           copy=False)
+        new.columns = df.columns
+        return new
+
+    def insertRows(self, positions):
+        """Insert empty rows, one before each of the given positions in
+        one copy of the table. Repeat a position to insert several rows
+        there. Returns the old position of each row, -1 for new ones."""
 
-    def addRow(self, rowindex):
-        """Inserts a row at the required index by append/concat"""
+        df = self.df
+        indexer = np.insert(np.arange(len(df)), np.sort(positions), -1)
+        if not self.takeViewRows(indexer):
+            self.df = self.takeRows(df, indexer)
+        return indexer
+
+    def appendRows(self, num):
+        """Add empty rows to the end. Rows come from spare capacity kept
+        after the data, which is doubled when it runs out, so repeated
+        appends only copy the table now and then. Returns the old
+        position of each row, -1 for new ones."""
 
         df = self.df
-        a, b = df[:rowindex], df[rowindex:]
-        a = a.append(pd.Series(), ignore_index=1)
-        self.df = pd.concat([a,b])
-        return
+        n = len(df)
+        indexer = np.arange(n+num)
+        indexer[n:] = -1
+        if self.takeViewRows(indexer):
+            return indexer
+        buf = self._rowbuffer
+        if buf is None or buf[1] is not df or \
+            buf[2] is not getattr(df._mgr, 'blocks', None) or n+num > len(buf[0]):
+            #table changed since the last append, copy it with spare rows
+            size = max(2*n, n+num, 64)
+            spareindexer = np.arange(size)
+            spareindexer[n:] = -1
+            #consolidated so that later copies leave the blocks alone
+            spare = self.takeRows(df, spareindexer).copy()
+        else:
+            spare = buf[0]
+        m = n+num
+        #shallow copy of the slice shares the data but is not a view
+        #that warns when set
+        new = spare.iloc[:m].copy(deep=False)
+        self.df = new
+        self._rowbuffer = (spare, new, getattr(new._mgr, 'blocks', None))
+        return indexer
 
     def deleteRow(self, row, unique=True):
         """Delete a row"""
@@ -215,22 +410,443 @@ class TableModel(object):
         return
 
     def deleteRows(self, rowlist=None, unique=True):
-        """Delete multiple or all rows"""
+        """Delete multiple or all rows. rowlist can be positions, a
+        RangeList or a boolean mask of the rows to delete. Returns the
+        old positions of the rows kept. If unique is False all rows with
+        the same labels as those given are deleted."""
 
         df = self.df
-        if unique == True:
-            rows = list(set(range(len(df))) - set(rowlist))
-            self.df = df.iloc[rows]
+        mask = np.ones(len(df), dtype=bool)
+        if rowlist is None:
+            mask[:] = False
+        elif hasattr(rowlist, 'ranges'):
+            for a,b in rowlist.ranges:
+                mask[a:b] = False
+        elif len(rowlist) > 0:
+            rows = np.asarray(rowlist)
+            if rows.dtype == bool:
+                mask &= ~rows
+            else:
+                mask[rows] = False
+        if unique == False:
+            mask = ~df.index.isin(df.index[~mask])
+        indexer = np.flatnonzero(mask)
+        if not self.takeViewRows(indexer):
+            self.df = df[mask]
+        return indexer
+
+    def duplicateRows(self, rows):
+        """Add copies of rows at the end. Returns the old position of
+        each row."""
+
+        df = self.df
+        indexer = np.concatenate([np.arange(len(df)), np.asarray(rows, dtype=int)])
+        if not self.takeViewRows(indexer):
+            self.df = self.takeRows(df, indexer)
+        return indexer
+
+    def getSortBase(self, build=True):
+        """The unsorted, unfiltered table and the positions of its rows
+        now shown, None if all rows are shown in their original order.
+        If the table changed since it was sorted the current rows become
+        the base, unless they are filtered. The unsorted table is not kept
+        while all rows are shown sorted, it is made again from them here
+        unless build is False, when it may be None."""
+
+        sb = self._sortbase
+        if sb is None or (not self.isSortKey(sb[2]) and self._rowfilter is None):
+            self._sortbase = sb = (self.df, None, self.getSortKey())
+            self._sortorder = None
+            self._sortcache = OrderedDict()
+        if sb[0] is None and build == True:
+            sb = self.buildBase()
+        return sb[0], sb[1]
+
+    def buildBase(self):
+        """Make the unsorted table from the sorted rows shown after it
+        was released"""
+
+        base, rows, key = self._sortbase
+        if base is None:
+            inverse = np.empty(len(rows), dtype=int)
+            inverse[rows] = np.arange(len(rows))
+            base = self._df.take(inverse)
+            self._sortbase = (base, rows, key)
+        return self._sortbase
+
+    def releaseBase(self):
+        """Drop the unsorted table when all rows are shown sorted, only
+        the order is needed to restore it. Memory for a second copy of
+        the table is then only used while filtered."""
+
+        sb = self._sortbase
+        if sb is None or sb[0] is None or sb[1] is None:
+            return
+        if self._rowfilter is None and len(sb[1]) == len(sb[0]):
+            self._sortbase = (None,) + sb[1:]
+        return
+
+    def getSortKey(self):
+        """Identifies the rows shown, the blocks are checked as well as
+        the version in case columns were changed in place, and the index
+        in case rows were reordered or dropped in place"""
+
+        df = self.df
+        return (self.version, df, getattr(df._mgr, 'blocks', None), df.index)
+
+    def isSortKey(self, key, values=True):
+        """True if key from getSortKey is still current. If values is
+        False columns may have been replaced but the rows must be the same."""
+
+        df = self._df
+        if key[0] != self.version or key[1] is not df or key[3] is not df.index:
+            return False
+        return values == False or key[2] is getattr(df._mgr, 'blocks', None)
+
+    def getCurrentBase(self, rebase=False):
+        """The sort base if the rows shown are the ones taken from it and
+        there was no other change since, else None. The blocks are not
+        compared since they change when columns are replaced, which is
+        what gets written back, but any change to the rows replaces the
+        index. If rebase is True the frame may also have been replaced by
+        one with the same unique row labels, e.g. with columns renamed or
+        an earlier copy restored."""
+
+        sb = self._sortbase
+        if sb is None or self.isSortKey(sb[2], values=False):
+            return sb
+        df = self._df
+        index = sb[2][3]
+        if rebase == True and index.is_unique and len(index) == len(df) \
+            and df.index.equals(index):
+            return sb
+        return None
+
+    def releaseRows(self):
+        """Make the rows shown the unfiltered table in their order, the
+        rows not shown are dropped"""
+
+        self._sortbase = None
+        self._sortorder = None
+        self._rowfilter = None
+        self._sortcache = OrderedDict()
+        return
+
+    def setBase(self, base, rows):
+        """Make base the unfiltered table after rows were added to or
+        removed from it or its index changed, and show the rows at
+        positions rows"""
+
+        self._sortbase = None
+        self._df = base.take(rows)
+        self.dataChanged()
+        self._sortbase = (base, rows, self.getSortKey())
+        self._sortcache = OrderedDict()
+        self.releaseBase()
+        return
+
+    def changeBase(self, func):
+        """Call func to change the unfiltered table in place when the
+        rows are sorted or filtered, and show the same rows of it after.
+        Returns False if the rows shown are the whole table."""
+
+        sb = self.getCurrentBase()
+        if sb is None or sb[1] is None:
+            return False
+        base, rows = self.buildBase()[:2]
+        func(base)
+        self.setBase(base, rows)
+        return True
+
+    def takeViewRows(self, indexer):
+        """Change the rows shown to those at the indexer positions, -1
+        for new empty rows, when they are sorted or filtered. Rows left
+        out are deleted from the unfiltered table too, new and repeated
+        rows are added to it after the row shown before them, so that
+        the filter can be cleared and the order restored after.
+        Returns False if the rows shown are the whole table."""
+
+        sb = self.getCurrentBase()
+        if sb is None or sb[1] is None:
+            return False
+        base, rows = self.buildBase()[:2]
+        rows = np.asarray(rows)
+        n = len(base)
+        indexer = np.asarray(indexer, dtype=int)
+        m = len(indexer)
+        source = np.where(indexer >= 0, rows[np.maximum(indexer, 0)], -1)
+        #the first time a row is shown it is the same row
+        first = np.zeros(m, dtype=bool)
+        valid = np.flatnonzero(indexer >= 0)
+        first[valid[np.unique(indexer[valid], return_index=True)[1]]] = True
+        #base position of the row before each added one, -1 at the top
+        prev = np.maximum.accumulate(np.where(first, np.arange(m), -1))
+        anchor = np.where(prev >= 0, source[np.maximum(prev, 0)], -1)
+        keep = np.ones(n, dtype=bool)
+        keep[rows] = False
+        keep[source[first]] = True
+        kept = np.flatnonzero(keep)
+        added = np.flatnonzero(~first)
+        k = len(kept)
+        pos = np.concatenate([kept, anchor[added]])
+        seq = np.concatenate([np.zeros(k, dtype=int), added+1])
+        order = np.lexsort((seq, pos))
+        newpos = np.empty(len(order), dtype=int)
+        newpos[order] = np.arange(len(order))
+        oldtonew = np.full(n, -1)
+        oldtonew[kept] = newpos[:k]
+        newrows = np.empty(m, dtype=int)
+        newrows[first] = oldtonew[source[first]]
+        newrows[added] = newpos[k:]
+        perm, mask = self._sortorder, self._rowfilter
+        if mask is not None:
+            mask = np.zeros(len(order), dtype=bool)
+            mask[newrows] = True
+        if perm is not None:
+            #hidden rows keep their place, added ones follow their anchor
+            p = oldtonew[perm]
+            p = p[p >= 0]
+            at = np.empty(len(order))
+            at[p] = np.arange(len(p))
+            newanchor = np.where(anchor[added] >= 0,
+                                 at[oldtonew[np.maximum(anchor[added], 0)]], -1) + 0.5
+            items = np.concatenate([p, newpos[k:]])
+            keys = np.concatenate([np.arange(len(p)), newanchor])
+            seq = np.concatenate([np.zeros(len(p), dtype=int), added+1])
+            perm = items[np.lexsort((seq, keys))]
+        baseindexer = np.concatenate([kept, source[added]])[order]
+        newbase = self.takeRows(base, baseindexer)
+        self._sortorder, self._rowfilter = perm, mask
+        self.setBase(newbase, newrows)
+        return True
+
+    def setBaseFrame(self, sb):
+        """Copy all columns of the rows shown to the unfiltered table
+        after the frame changed in ways not given by column names, e.g.
+        columns renamed or a new frame with the same rows. Columns are
+        matched by name, or by position if all were renamed. Returns
+        False if they can't be matched."""
+
+        base, rows = sb[0], sb[1]
+        df = self._df
+        if base is None:
+            #the rows shown are all there is
+            self._sortbase = (None, rows, self.getSortKey())
+            self._sortcache = OrderedDict()
+            return True
+        if not df.columns.is_unique or not base.columns.is_unique:
+            return False
+        if len(base.columns) == len(df.columns) and \
+            not df.columns.isin(base.columns).all():
+            #renamed, the base has its columns in the same order
+            base = base.copy(deep=False)
+            base.columns = df.columns
+        self._sortbase = (base, rows, sb[2])
+        if not self.setBaseColumns(list(df.columns)):
+            return False
+        base = self._sortbase[0]
+        if list(base.columns) != list(df.columns):
+            base = base[list(df.columns)]
+        self._sortbase = (base, rows, self.getSortKey())
+        self._sortcache = OrderedDict()
+        return True
+
+    def setBaseOrder(self, sb):
+        """Give the unsorted table the columns of the rows shown after
+        they were moved or deleted, sb is from getCurrentBase before"""
+
+        if sb is None:
+            return
+        base, rows = sb[0], sb[1]
+        df = self._df
+        if rows is None:
+            base = df
+        elif base is None:
+            pass
+        elif base.columns.is_unique and df.columns.isin(base.columns).all():
+            base = base[list(df.columns)]
         else:
-            df.drop(df.index[rowlist],inplace=True)
+            return
+        self._sortbase = (base, rows, self.getSortKey())
         return
 
+    def getUnfiltered(self):
+        """The table with all rows in their original order"""
+
+        return self.getSortBase()[0]
+
+    def getColumnIndex(self, name, wait=False, request=True):
+        """Sorted index of a column of the unfiltered table, None if there
+        is no up to date one. It is then made now if wait is True,
+        otherwise in the background for next time if request is True."""
+
+        base = self.getUnfiltered()
+        key = self.getColumnVersion(name)
+        idx = self.indexer.get(base, name, key)
+        if idx is not None:
+            return idx
+        if wait == True:
+            try:
+                return self.indexer.build(base, name, key)
+            except (TypeError, ValueError):
+                return None
+        if request == True:
+            self.indexer.request(base, name, key)
+        return None
+
+    def isSorted(self):
+        """True if rows are sorted and the original order can be restored"""
+
+        self.getSortBase(build=False)
+        return self._sortorder is not None
+
+    def isFiltered(self):
+        """True if only some rows are shown"""
+
+        self.getSortBase(build=False)
+        return self._rowfilter is not None
+
+    def getSortOrder(self, base, cols, ascending, maxsize=4):
+        """Permutation of the unsorted rows sorting them by the columns.
+        Permutations are cached per key, a sort by several columns
+        reuses the one for the minor keys and only sorts the first."""
+
+        key = (tuple(cols), tuple(ascending))
+        perm = self._sortcache.get(key)
+        if perm is not None:
+            self._sortcache.move_to_end(key)
+            return perm
+        if len(cols) == 0:
+            #by the index, stable like sort_index
+            perm = self.argsortColumn(pd.Series(base.index), ascending[0],
+                                      kind='mergesort')
+        elif len(cols) > 1:
+            #a stable sort of the minor key order by the first column
+            perm = self.getSortOrder(base, cols[1:], ascending[1:], maxsize)
+            values = base[cols[0]].take(perm)
+            perm = perm[self.argsortColumn(values, ascending[0], kind='mergesort')]
+        else:
+            perm = self.argsortColumn(base[cols[0]], ascending[0])
+        self._sortcache[key] = perm
+        while len(self._sortcache) > maxsize:
+            self._sortcache.popitem(last=False)
+        return perm
+
+    def argsortColumn(self, column, ascending=True, kind='quicksort'):
+        """Argsort of a column with nulls last, use a stable kind to
+        keep the order of ties"""
+
+        column = pd.Series(column.array, copy=False)
+        s = column.sort_values(ascending=ascending, kind=kind,
+                               na_position='last')
+        return s.index.to_numpy()
+
+    def sortRows(self, cols, ascending=True):
+        """Sort rows by one or more columns. The order is a permutation of
+        the unsorted rows kept by the model, so sorting again by the same
+        columns or restoring the original order does not sort again.
+        Only the sorted rows are kept, the unsorted table is made again
+        from them when needed, but while also filtered both are kept.
+        Returns the old position of each row.
+        Args:
+            cols: column names, the first is the main key, or an empty
+                list to sort by the index
+            ascending: bool or list of bools, one per column
+        """
+
+        if not isinstance(ascending, (list, tuple)):
+            ascending = [ascending]*max(len(cols), 1)
+        ascending = [bool(a) for a in ascending]
+        base, rows = self.getSortBase()
+        self._sortorder = self.getSortOrder(base, list(cols), ascending)
+        return self.updateRows()
+
+    def restoreOrder(self):
+        """Put the rows back in their order before sorting. Returns the old
+        position of each row, None if there was nothing to restore."""
+
+        if not self.isSorted():
+            return None
+        self._sortorder = None
+        return self.updateRows()
+
+    def setRowFilter(self, mask=None):
+        """Show only some rows. Rows are taken from the unfiltered table,
+        so cell edits and columns marked changed with dataChanged are
+        written through to it and clearing the filter swaps it back in.
+        Rows added or removed while filtered are added to or removed
+        from it too.
+        Returns the old position of each row, -1 for rows not shown before.
+        Args:
+            mask: boolean array over the rows of getUnfiltered, or None
+                to show all rows
+        """
+
+        if mask is None and not self.isFiltered():
+            return None
+        base, rows = self.getSortBase()
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool)
+            if len(mask) != len(base):
+                raise ValueError('filter has %s rows, table has %s'
+                                 %(len(mask), len(base)))
+        self._rowfilter = mask
+        return self.updateRows(reorder=False)
+
+    def getViewRows(self, mask):
+        """Positions in the rows shown of the unfiltered rows where mask
+        is True"""
+
+        base, rows = self.getSortBase()
+        mask = np.asarray(mask, dtype=bool)
+        if rows is None:
+            return np.flatnonzero(mask)
+        return np.flatnonzero(mask[rows])
+
+    def updateRows(self, reorder=True):
+        """Show the rows of the base table given by the sort order and
+        filter. Returns the old position of each row, -1 for rows not
+        shown before, or None if the rows shown had been changed."""
+
+        #getSortBase was called before the order or filter changed
+        base, old, key = self.buildBase()
+        perm, mask = self._sortorder, self._rowfilter
+        if mask is None:
+            new = perm
+        elif perm is None:
+            new = np.flatnonzero(mask)
+        else:
+            new = perm[mask[perm]]
+        n = len(base)
+        if not self.isSortKey(key):
+            indexer = None
+        else:
+            if old is None:
+                inverse = np.arange(n)
+            else:
+                inverse = np.full(n, -1)
+                inverse[old] = np.arange(len(old))
+            indexer = inverse if new is None else inverse[new]
+        if new is None:
+            self._df = base
+        else:
+            self._df = base.take(new)
+        #the values are the same, so column versions are kept
+        self.dataChanged(cols=[])
+        if not reorder:
+            self.profiler.invalidate()
+            self.clearCache()
+        self._sortbase = (base, new, self.getSortKey())
+        self.releaseBase()
+        return indexer
+
     def addColumn(self, colname=None, dtype=None, data=None):
         """Add a column"""
 
         if data is None:
             data = pd.Series(dtype=dtype)
         self.df[colname] = data
+        self.dataChanged(cols=[colname])
         return
 
     def deleteColumn(self, colindex):
@@ -238,7 +854,10 @@ class TableModel(object):
 
         df = self.df
         colname = df.columns[colindex]
+        sb = self.getCurrentBase()
         df.drop([colname], axis=1, inplace=True)
+        self.dataChanged(cols=[])
+        self.setBaseOrder(sb)
         return
 
     def deleteColumns(self, cols=None):
@@ -246,38 +865,56 @@ class TableModel(object):
 
         df = self.df
         colnames = df.columns[cols]
+        sb = self.getCurrentBase()
         df.drop(colnames, axis=1, inplace=True)
+        self.dataChanged(cols=[])
+        self.setBaseOrder(sb)
         return
 
     def deleteCells(self, rows, cols):
+        """Clear cells, rows and cols are lists or RangeLists of positions"""
+
+        #iloc cannot set values with a RangeList so use positions
+        if hasattr(rows, 'getIndexer'):
+            rows = rows.getIndexer()
+        else:
+            rows = np.asarray(rows, dtype=int)
+        cols = np.asarray(cols, dtype=int)
         self.df.iloc[rows,cols] = np.nan
+        self.dataChanged(cols=self.df.columns[cols])
         return
 
     def resetIndex(self, drop=False):
-        """Reset index behaviour"""
+        """Reset index behaviour, of the whole table if filtered"""
 
-        df = self.df
-        df.reset_index(drop=drop,inplace=True)
+        func = lambda df: df.reset_index(drop=drop,inplace=True)
+        if not self.changeBase(func):
+            func(self.df)
+            self.dataChanged()
         return
 
     def setindex(self, colindex):
         """Index setting behaviour"""
 
-        df = self.df
-        colnames = list(df.columns[colindex])
-        indnames = df.index.names
-        if indnames[0] != None:
-            df.reset_index(inplace=True)
-        df.set_index(colnames, inplace=True)
+        colnames = list(self.df.columns[colindex])
+        def func(df):
+            if df.index.names[0] != None:
+                df.reset_index(inplace=True)
+            df.set_index(colnames, inplace=True)
+        if not self.changeBase(func):
+            func(self.df)
+            self.dataChanged()
         return
 
     def copyIndex(self):
         """Copy index to a column"""
 
-        df = self.df
-        name = df.index.name
+        name = self.df.index.name
         if name == None: name='index'
-        df[name] = df.index#.astype('object')
+        func = lambda df: df.__setitem__(name, df.index)
+        if not self.changeBase(func):
+            func(self.df)
+            self.dataChanged()
         return
 
     def groupby(self, cols):
@@ -344,24 +981,23 @@ class TableModel(object):
          """Returns the cell value at location specified
              by columnIndex and rowIndex."""
 
-         df = self.df
-         value = self.df.iloc[row,col]
+         value = self.getColumnArray(col)[row]
          if type(value) is float and np.isnan(value):
              return ''
          return value
 
     def setValueAt(self, value, row, col, df=None):
         """Change dataframe according to row/col numbers. You can
-        also pass an arbitrary dataframe here."""
+        also pass an arbitrary dataframe here. The value is cast to the
+        column type and set by position, so the index is not used."""
 
         if df is None:
             df = self.df
-        rowindex = df.iloc[row].name
         colindex = df.columns[col]
-        #print (df.loc[rowindex,colindex])
+        column = df.iloc[:,col]
         if value == '':
             value = np.nan
-        dtype = self.df.dtypes[col]
+        dtype = column.dtype
         #try to cast to column type
         try:
             if dtype == 'float64':
@@ -372,13 +1008,106 @@ class TableModel(object):
                 value = pd.to_datetime(value)
         except Exception as e:
             print (e)
-        if df.index.is_unique is True:
-            df.loc[rowindex,colindex] = value
-        else:
-            #we cannot use index if not unique
+        oldvalue = column.iat[row]
+        sb = self._sortbase
+        if df is not self.df or sb is None or not self.isSortKey(sb[2]):
+            sb = None
+        if not self.setArrayValue(column, row, value):
+            #may change the column type
             df.iloc[row,col] = value
+            self._arrays.pop(col, None)
+        if df is self.df:
+            self.profiler.updateValue(colindex, oldvalue, value)
+        if sb is not None:
+            self.setBaseValue(value, row, col)
+        self.dataChanged(cols=[])
+        #profile and cached arrays were updated, only the version changes
+        self._colversions[colindex] = self.version
+        if sb is not None:
+            #still the same rows, keep the unsorted table
+            self._sortbase = sb[:2] + (self.getSortKey(),)
+        return
+
+    def setBaseValue(self, value, row, col):
+        """Copy a cell edit to the unsorted table if the rows are sorted
+        and drop sort orders that used the column"""
+
+        base, order, v = self._sortbase
+        name = self._df.columns[col]
+        if order is not None and base is not None:
+            row = order[row]
+            col = base.columns.get_loc(name)
+            if not self.setArrayValue(base.iloc[:,col], row, value):
+                base.iloc[row,col] = value
+        for key in list(self._sortcache):
+            if name in key[0]:
+                del self._sortcache[key]
         return
 
+    def setBaseColumns(self, cols):
+        """Copy columns of the rows shown to the unsorted table, adding
+        them if new, and drop sort orders that used them. Returns False
+        if the rows shown are not those the table was sorted from."""
+
+        base, rows, key = self._sortbase
+        df = self._df
+        for key in list(self._sortcache):
+            if len(set(key[0]) & set(cols)) > 0:
+                del self._sortcache[key]
+        if rows is None:
+            return base is df
+        if base is None:
+            return True
+        if len(rows) != len(df) or not base.columns.is_unique \
+            or not df.columns.is_unique:
+            return False
+        for name in cols:
+            if name not in df.columns:
+                continue
+            values = df[name]
+            if name in base.columns:
+                column = base[name]
+            else:
+                column = pd.Series(np.nan, index=base.index)
+            if column.dtype != values.dtype:
+                try:
+                    column = column.astype(values.dtype)
+                except (TypeError, ValueError):
+                    column = column.astype(object)
+            else:
+                column = column.copy()
+            try:
+                column.iloc[rows] = values.array
+            except (TypeError, ValueError):
+                column = column.astype(object)
+                column.iloc[rows] = values.to_numpy()
+                column = column.infer_objects()
+            base[name] = column
+        return True
+
+    def setArrayValue(self, column, row, value):
+        """Write a value straight into the numpy array of a column if
+        its type can hold the value without changing. Returns False if
+        it can't, e.g. for text in a float column or extension types."""
+
+        arr = column.values
+        if not isinstance(arr, np.ndarray) or not arr.flags.writeable:
+            return False
+        kind = arr.dtype.kind
+        if isinstance(value, (bool, np.bool_)):
+            ok = kind in 'bO'
+        elif isinstance(value, (int, np.integer)):
+            ok = kind in 'fO' or (kind == 'i' and
+                    np.iinfo(arr.dtype).min <= value <= np.iinfo(arr.dtype).max)
+        elif isinstance(value, (float, np.floating)):
+            ok = kind in 'fO'
+        else:
+            ok = kind == 'O'
+        if not ok:
+            return False
+        arr[row] = value
+        return True
+
     def transpose(self):
         """Transpose dataframe"""
 
@@ -412,3 +1141,513 @@ class TableModel(object):
 
     def __repr__(self):
         return 'Table Model with %s rows' %len(self.df)
+
+class ColumnProfiler(object):
+    """Summary of each column of a dataframe: dtype, nulls, min/max, a
+    quantile of the displayed string lengths, an estimate of distinct
+    values and memory used. Used for column widths, the info and describe
+    views and the status bar. Large columns are profiled from evenly
+    spaced chunks of rows, either on request or by a background thread.
+    Cell edits update a profile in place, other changes mark it out of
+    date. Profiles are keyed on column name and on the versions bumped by
+    the model's dataChanged, and keep the block of the frame the column
+    was in to catch columns replaced without marking the data changed."""
+
+    def __init__(self, chunks=20, chunksize=500, quantile=99):
+        self.chunks = chunks
+        self.chunksize = chunksize
+        self.quantile = quantile
+        self.profiles = {}
+        #bumped when all or one column is invalidated
+        self.epoch = 0
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.pending = set()
+        #columns that could not be profiled, not requested again
+        self.failed = set()
+        self.worker = None
+        return
+
+    def getKey(self, name):
+        return (self.epoch, self.generations.get(name, 0))
+
+    def invalidate(self, cols=None):
+        """Mark profiles out of date, all of them if cols is None"""
+
+        with self.lock:
+            if cols is None:
+                self.epoch += 1
+                self.profiles = {}
+                self.pending = set()
+                return
+            for name in cols:
+                self.generations[name] = self.generations.get(name, 0) + 1
+                self.profiles.pop(name, None)
+        return
+
+    def getSample(self, s):
+        """Rows to profile, all of them for small columns otherwise
+        chunks spread evenly from the start to the end"""
+
+        n = len(s)
+        size = self.chunksize
+        if n <= self.chunks*size:
+            return s, False
+        starts = np.linspace(0, n-size, self.chunks).astype(int)
+        idx = np.concatenate([np.arange(i, i+size) for i in starts])
+        return s.iloc[idx], True
+
+    def getBlock(self, df, col):
+        """The block of the frame holding a column position, replaced
+        when the column or the rows are, or None if not known"""
+
+        mgr = getattr(df, '_mgr', None)
+        try:
+            return mgr.blocks[mgr.blknos[col]]
+        except (AttributeError, IndexError):
+            return None
+
+    def makeProfile(self, s):
+        """Profile of a series. Nulls, min/max, mean and std use the
+        whole column, lengths, distinct values and quartiles the sample."""
+
+        n = len(s)
+        sample, sampled = self.getSample(s)
+        vals = sample.dropna()
+        nulls = int(s.isna().sum())
+        p = {'dtype': str(s.dtype), 'rows': n, 'nulls': nulls,
+             'sampled': sampled, 'min': None, 'max': None}
+        numeric = pd.api.types.is_numeric_dtype(s.dtype) and \
+                    not pd.api.types.is_bool_dtype(s.dtype)
+        try:
+            if numeric or pd.api.types.is_datetime64_any_dtype(s.dtype):
+                p['min'], p['max'] = s.min(), s.max()
+            elif len(vals) > 0:
+                p['min'], p['max'] = vals.min(), vals.max()
+        except TypeError:
+            #values can't be compared
+            pass
+        if numeric:
+            p['mean'], p['std'] = s.mean(), s.std()
+            x = vals.to_numpy(dtype='float64')
+            q = np.percentile(x, [25,50,75]) if len(x) > 0 else [np.nan]*3
+            p['25%'], p['50%'], p['75%'] = q
+        #same text as the old longest entry check, floats to 3 places
+        if s.dtype == 'float64':
+            sample = sample.round(3)
+        lens = sample.astype('object').astype('str').str.len().to_numpy()
+        if len(lens) > 0:
+            p['length'] = int(np.ceil(np.percentile(lens, self.quantile)))
+            p['maxlength'] = int(lens.max())
+        else:
+            p['length'] = p['maxlength'] = 1
+        try:
+            counts = vals.value_counts().to_numpy()
+            d = int((counts>1).sum())
+            f1 = int((counts==1).sum())
+            if sampled == True and f1 == len(vals):
+                #no repeats in the sample, assume all are distinct
+                d = n-nulls
+            elif sampled == True:
+                #singletons in the sample stand for more unseen values
+                d += int(np.sqrt(float(n-nulls)/max(len(vals),1))*f1)
+            else:
+                d += f1
+            p['distinct'] = min(d, n-nulls)
+        except TypeError:
+            #unhashable values
+            p['distinct'] = None
+        if s.dtype == 'object' and len(sample) > 0:
+            m = sample.memory_usage(index=False, deep=True)
+            p['memory'] = int(float(m)/len(sample)*n)
+        else:
+            p['memory'] = int(s.memory_usage(index=False))
+        return p
+
+    def isFresh(self, p, df, col):
+        """True if a profile is up to date for a column position"""
+
+        name = df.columns[col]
+        if p is None or p['key'] != self.getKey(name):
+            return False
+        block = self.getBlock(df, col)
+        if block is None:
+            s = df.iloc[:,col]
+            return p['rows'] == len(s) and p['dtype'] == str(s.dtype)
+        return p['block'] is not None and p['block']() is block
+
+    def getProfiles(self, df, cols=None, wait=False):
+        """Profiles for column positions, as a dict. Out of date ones are
+        made now if wait is True, otherwise they are None.
+        Args:
+            df: the dataframe
+            cols: column positions, all if None
+            wait: make missing profiles now
+        """
+
+        if cols is None:
+            cols = range(len(df.columns))
+        result = {}
+        for col in cols:
+            name = df.columns[col]
+            p = self.profiles.get(name)
+            if not self.isFresh(p, df, col):
+                p = None
+                if wait == True:
+                    p = self.profile(df, col)
+            result[col] = p
+        return result
+
+    def getProfile(self, df, col, wait=True):
+        """Profile of one column position"""
+
+        return self.getProfiles(df, [col], wait)[col]
+
+    def profile(self, df, col, key=None):
+        """Make and store the profile of a column"""
+
+        name = df.columns[col]
+        if key is None:
+            key = self.getKey(name)
+        block = self.getBlock(df, col)
+        p = self.makeProfile(df.iloc[:,col])
+        p['key'] = key
+        p['block'] = weakref.ref(block) if block is not None else None
+        with self.lock:
+            #don't store if the column changed while profiling
+            if key == self.getKey(name):
+                self.profiles[name] = p
+        return p
+
+    def request(self, df, cols=None):
+        """Queue out of date columns to be profiled in the background"""
+
+        profiles = self.getProfiles(df, cols)
+        with self.lock:
+            for col in profiles:
+                if profiles[col] is not None:
+                    continue
+                name = df.columns[col]
+                key = (name, self.getKey(name))
+                if key in self.pending or key in self.failed:
+                    continue
+                self.pending.add(key)
+                self.queue.put((df, col, key))
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self.work)
+            self.worker.daemon = True
+            self.worker.start()
+        return
+
+    def isBusy(self):
+        """True if columns are waiting to be profiled"""
+
+        return len(self.pending) > 0
+
+    def work(self):
+        """Background thread profiling queued columns"""
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            df, col, key = item
+            with self.lock:
+                if key not in self.pending:
+                    continue
+            try:
+                self.profile(df, col, key[1])
+            except Exception:
+                #data changed while profiling
+                with self.lock:
+                    self.failed.add(key)
+            with self.lock:
+                self.pending.discard(key)
+        return
+
+    def stop(self):
+        """Stop the background thread"""
+
+        with self.lock:
+            self.pending = set()
+        if self.worker is not None and self.worker.is_alive():
+            self.queue.put(None)
+        return
+
+    def updateValue(self, name, old, new):
+        """Update a profile after one cell changed from old to new.
+        Returns False if the profile could not be updated, it is then
+        out of date."""
+
+        p = self.profiles.get(name)
+        if p is None or p['key'] != self.getKey(name):
+            return False
+        oldnull, newnull = pd.isnull(old), pd.isnull(new)
+        try:
+            lo, hi = p['min'], p['max']
+            #a changed min or max may no longer be the min or max
+            if not oldnull and lo is not None and (old == lo or old == hi):
+                if newnull or not (new <= lo or new >= hi):
+                    raise ValueError
+            if not newnull and lo is not None:
+                p['min'], p['max'] = min(lo, new), max(hi, new)
+            if 'mean' in p:
+                count = p['rows'] - p['nulls']
+                total = p['mean']*count
+                sumsq = p['std']**2*(count-1) + p['mean']**2*count
+                if not oldnull:
+                    total -= old; sumsq -= old**2; count -= 1
+                if not newnull:
+                    total += new; sumsq += new**2; count += 1
+                p['mean'] = total/count if count > 0 else np.nan
+                var = (sumsq - p['mean']**2*count)/(count-1) if count > 1 else np.nan
+                p['std'] = np.sqrt(max(var, 0))
+        except Exception:
+            self.invalidate([name])
+            return False
+        p['nulls'] += int(newnull) - int(oldnull)
+        if not newnull:
+            #an edited value should always fit its column
+            l = len(str(round(new, 3) if isinstance(new, float) else new))
+            p['length'] = max(p['length'], l)
+            p['maxlength'] = max(p['maxlength'], l)
+        return True
+
+    def getSummary(self, df):
+        """Profiles of all columns as a dataframe, one row per column"""
+
+        profiles = self.getProfiles(df, wait=True)
+        fields = ['dtype','nulls','distinct','min','max','length',
+                  'maxlength','memory']
+        rows = [[profiles[c][f] for f in fields] for c in profiles]
+        s = pd.DataFrame(rows, columns=fields, index=df.columns)
+        s.insert(1, 'non-null', len(df)-s.nulls)
+        return s
+
+    def describe(self, df):
+        """Same as df.describe() for numeric columns but from the profiles.
+        Quartiles of sampled columns are estimates."""
+
+        profiles = self.getProfiles(df, wait=True)
+        fields = ['count','mean','std','min','25%','50%','75%','max']
+        data = OrderedDict()
+        for c in profiles:
+            p = dict(profiles[c])
+            if 'mean' not in p:
+                continue
+            p['count'] = p['rows'] - p['nulls']
+            data[df.columns[c]] = [float(p[f]) for f in fields]
+        if len(data) == 0:
+            return df.describe()
+        return pd.DataFrame(data, index=fields)
+
+class SortedIndex(object):
+    """Rows of a column in the order of their values, so that range and
+    equality filters are a binary search instead of a scan of the
+    column. Nulls are left out. Only numpy columns can be indexed."""
+
+    ops = ['>', '<', 'equals', 'not equals']
+
+    def __init__(self, column, key=None):
+        values = column.to_numpy()
+        if not isinstance(column.dtype, np.dtype) or values.dtype.kind not in 'biufmMO':
+            raise TypeError('can not index %s' %column.dtype)
+        nulls = column.isnull().to_numpy()
+        valid = np.flatnonzero(~nulls)
+        if len(valid) < len(values):
+            values = values[valid]
+        if values.dtype.kind == 'O':
+            #sort the distinct values and then their integer codes
+            codes, uniques = pd.factorize(values, sort=True)
+            order = np.argsort(codes, kind='stable')
+            values = np.asarray(uniques, dtype=object)[codes]
+        else:
+            order = np.argsort(values)
+        dtype = np.int32 if len(column) < 2**31 else np.int64
+        self.values = values[order]
+        self.order = valid[order].astype(dtype)
+        self.rows = len(column)
+        self.kind = self.values.dtype.kind
+        self.key = key
+        #object values are shared with the column, only pointers count
+        self.nbytes = self.values.nbytes + self.order.nbytes
+        return
+
+    def accepts(self, value):
+        """True if value compares with the sorted values the same way
+        as with the column, otherwise the column should be scanned, e.g.
+        text is never equal to a bool but would be converted to one"""
+
+        kind = self.kind
+        if isinstance(value, (bool, np.bool_)):
+            return kind == 'b'
+        if kind in 'iuf':
+            return isinstance(value, (int, float, np.integer, np.floating))
+        if kind == 'M':
+            return isinstance(value, (str, datetime.datetime, np.datetime64))
+        if kind == 'm':
+            return isinstance(value, (str, datetime.timedelta, np.timedelta64))
+        if kind == 'O':
+            return isinstance(value, str)
+        return False
+
+    def convert(self, value):
+        """Value as the type of the sorted values, dates from text"""
+
+        if self.kind == 'M' and isinstance(value, str):
+            return pd.Timestamp(value).to_datetime64()
+        if self.kind == 'm' and isinstance(value, str):
+            return pd.Timedelta(value).to_timedelta64()
+        return value
+
+    def getRange(self, op, value):
+        """Start and end in the sorted values of those matching op"""
+
+        v = self.values
+        value = self.convert(value)
+        if pd.isnull(value):
+            #nothing compares true with a null
+            return 0, 0
+        if op == '>':
+            return np.searchsorted(v, value, 'right'), len(v)
+        elif op == '<':
+            return 0, np.searchsorted(v, value, 'left')
+        return np.searchsorted(v, value, 'left'), np.searchsorted(v, value, 'right')
+
+    def lookup(self, op, value):
+        """Boolean mask of the rows where the column compares true with
+        value, the same as a scan. op is one of ops."""
+
+        lo, hi = self.getRange(op, value)
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[self.order[lo:hi]] = True
+        if op == 'not equals':
+            #nulls are not equal to anything
+            mask = ~mask
+        return mask
+
+    def find(self, value, positions=None):
+        """First row with the value or the next larger one, None if
+        there is none.
+        Args:
+            value: value to find
+            positions: where each row is shown, -1 if it is not. The
+                position of the first row shown is returned
+        """
+
+        v = self.values
+        lo = np.searchsorted(v, self.convert(value), 'left')
+        if positions is None:
+            first = lo
+        else:
+            shown = np.flatnonzero(positions[self.order[lo:]] >= 0)
+            if len(shown) == 0:
+                return None
+            first = lo + shown[0]
+        if first >= len(v):
+            return None
+        #ties are not in row order, take the first of them
+        hi = np.searchsorted(v, v[first], 'right')
+        p = self.order[first:hi]
+        if positions is not None:
+            p = positions[p]
+            p = p[p >= 0]
+        return int(p.min())
+
+class ColumnIndexer(object):
+    """Sorted indexes of columns of a dataframe, made on request by a
+    background thread or when waited for. Indexes are kept by column
+    name with the key of the values they were made from, so that they
+    go out of date when the column is edited or the frame replaced.
+    The least recently used are dropped when there are more than maxsize
+    or they take more than maxbytes, the last one made is always kept."""
+
+    def __init__(self, maxsize=8, maxbytes=2**29):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.pending = set()
+        #columns that could not be indexed, not requested again
+        self.failed = set()
+        self.worker = None
+        return
+
+    def get(self, df, name, key):
+        """Index of a column if it is up to date, otherwise None"""
+
+        with self.lock:
+            item = self.indexes.get(name)
+            if item is None or item[0] is not df or item[1].key != key:
+                return None
+            self.indexes.move_to_end(name)
+            return item[1]
+
+    def build(self, df, name, key):
+        """Make and store the index of a column"""
+
+        idx = SortedIndex(df[name], key)
+        with self.lock:
+            self.indexes[name] = (df, idx)
+            self.indexes.move_to_end(name)
+            while len(self.indexes) > 1 and (len(self.indexes) > self.maxsize
+                                             or self.getSize() > self.maxbytes):
+                self.indexes.popitem(last=False)
+        return idx
+
+    def getSize(self):
+        """Memory used by the indexes in bytes"""
+
+        return sum(i[1].nbytes for i in self.indexes.values())
+
+    def request(self, df, name, key):
+        """Queue a column to be indexed in the background"""
+
+        with self.lock:
+            k = (name, key)
+            if k in self.pending or k in self.failed:
+                return
+            self.pending.add(k)
+            self.queue.put((df, name, key))
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self.work)
+            self.worker.daemon = True
+            self.worker.start()
+        return
+
+    def isBusy(self):
+        """True if columns are waiting to be indexed"""
+
+        return len(self.pending) > 0
+
+    def work(self):
+        """Background thread indexing queued columns"""
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            df, name, key = item
+            with self.lock:
+                if (name, key) not in self.pending:
+                    continue
+            try:
+                self.build(df, name, key)
+            except Exception:
+                #values can't be sorted or data changed while sorting
+                with self.lock:
+                    self.failed.add((name, key))
+            with self.lock:
+                self.pending.discard((name, key))
+        return
+
+    def stop(self):
+        """Stop the background thread"""
+
+        with self.lock:
+            self.pending = set()
+        if self.worker is not None and self.worker.is_alive():
+            self.queue.put(None)
+        return
@@ -43,7 +43,7 @@ from collections import OrderedDict
 import webbrowser
 import numpy as np
 import pandas as pd
-from .data import TableModel
+from .data import TableModel, SortedIndex
 from . import util, images
 
 def getParentGeometry(parent):
@@ -1177,33 +1177,25 @@ class FindReplaceDialog(Frame):
         return
 
     def find(self):
-        """Do string search. Creates a masked dataframe for results and then stores each cell
-        coordinate in a list."""
+        """Do string search. Creates a boolean mask array for results and then
+        stores each cell coordinate in an array."""
 
         table = self.table
         df = table.model.df
-        df = df.astype('object').astype('str')
         s = self.searchvar.get()
         case = self.casevar.get()
         self.search_changed = False
         self.clear()
         if s == '':
             return
-        found = pd.DataFrame()
-        for col in df:
-            found[col] = df[col].str.contains(s, na=False, case=case)
-        #set the masked dataframe so that highlighted cells are shown on redraw
+        #boolean mask of matching cells, rows x cols
+        found = np.zeros(df.shape, dtype=bool)
+        for j in range(len(df.columns)):
+            x = df.iloc[:,j].astype('object').astype('str')
+            found[:,j] = x.str.contains(s, na=False, case=case).values
+        #set the mask so that highlighted cells are shown on redraw
         table.highlighted = found
-        i=0
-        self.coords = []
-        for r,row in found.iterrows():
-            j=0
-            for col,val in row.iteritems():
-                if val is True:
-                    #print (r,col,val, i, j)
-                    self.coords.append((i,j))
-                j+=1
-            i+=1
+        self.coords = np.argwhere(found)
         self.current = 0
         return
 
@@ -1227,7 +1219,7 @@ class FindReplaceDialog(Frame):
         if len(self.coords)==0:
             return
         idx = self.current
-        i,j = self.coords[idx]
+        i,j = [int(k) for k in self.coords[idx]]
         table.movetoSelection(row=i,col=j,offset=3)
         table.redraw()
         table.drawSelectedRect(i, j, color='red')
@@ -1276,6 +1268,13 @@ class QueryDialog(Frame):
         self.table = table
         self.setup()
         self.filters = []
+        #masks of each filter and the query, by filter and column version
+        self.masks = OrderedDict()
+        self.maskbase = None
+        #filters of the last query and the mask after each of them
+        self.lastfilter = None
+        #columns scanned for comparisons, indexed if scanned again
+        self.scanned = set()
         return
 
     def setup(self):
@@ -1317,17 +1316,15 @@ class QueryDialog(Frame):
 
         table = self.table
         s = self.queryvar.get()
-        if table.filtered == True:
-            table.model.df = table.dataframe
-        df = table.model.df
+        #filters are evaluated on all rows, which are never copied
+        df = table.model.getUnfiltered()
         mask = None
 
+        self.checkMasks(df)
         #string query first
         if s!='':
-            try:
-                mask = df.eval(s)
-            except:
-                mask = df.eval(s, engine='python')
+            key = ('query', s, table.model.getColumnVersion())
+            mask = self.getMask(key, lambda: self.evalQuery(df, s))
         #add any filters from widgets
         if len(self.filters)>0:
             mask = self.applyFilter(df, mask)
@@ -1336,19 +1333,15 @@ class QueryDialog(Frame):
             self.queryresultvar.set('')
             return
         #apply the final mask
-        self.filtdf = filtdf = df[mask]
-        self.queryresultvar.set('%s rows found' %len(filtdf))
+        self.filtmask = mask = np.asarray(mask, dtype=bool)
+        self.queryresultvar.set('%s rows found' %mask.sum())
 
         if self.applyqueryvar.get() == 1:
-            #replace current dataframe but keep a copy!
-            table.dataframe = table.model.df.copy()
-            table.delete('rowrect')
-            table.multiplerowlist = []
-            table.model.df = filtdf
-            table.filtered = True
+            table.filterRows(mask)
         else:
-            idx = filtdf.index
-            rows = table.multiplerowlist = table.getRowsFromIndex(idx)
+            table.showAll()
+            table.multiplerowlist = table.model.getViewRows(mask)
+            rows = table.multiplerowlist
             if len(rows)>0:
                 table.currentrow = rows[0]
 
@@ -1364,12 +1357,51 @@ class QueryDialog(Frame):
         self.filters.append(fb)
         return
 
-    def applyFilter(self, df, mask=None):
-        """Apply the widget based filters, returns a boolean mask"""
+    def evalQuery(self, df, s):
+        """Boolean mask from a string query"""
 
-        if mask is None:
-            mask = df.index==df.index
+        try:
+            mask = df.eval(s)
+        except:
+            mask = df.eval(s, engine='python')
+        return np.asarray(mask, dtype=bool)
+
+    def checkMasks(self, df):
+        """Drop cached masks if the unfiltered table was replaced"""
+
+        if self.maskbase is not df:
+            self.masks = OrderedDict()
+            self.maskbase = df
+            self.lastfilter = None
+            self.scanned = set()
+        return
+
+    def getMask(self, key, func, maxsize=16):
+        """Cached mask for a key, made with func if not present"""
+
+        mask = self.masks.get(key)
+        if mask is not None:
+            self.masks.move_to_end(key)
+            return mask
+        mask = func()
+        self.masks[key] = mask
+        while len(self.masks) > maxsize:
+            self.masks.popitem(last=False)
+        return mask
 
+    def applyFilter(self, df, mask=None):
+        """Apply the widget based filters, returns a boolean mask.
+        The mask of each filter is cached and the last query is reused
+        up to the first filter that changed. If the rest are joined with
+        AND, new filters are only evaluated on the rows that passed the
+        filters before them."""
+
+        model = self.table.model
+        self.checkMasks(df)
+        start = mask
+        if mask is None:
+            mask = np.ones(len(df), dtype=bool)
+        filters = []
         for f in self.filters:
             col, val, op, b = f.getFilter()
             try:
@@ -1377,53 +1409,118 @@ class QueryDialog(Frame):
             except:
                 pass
             #print (col, val, op, b)
-            if op == 'contains':
-                m = df[col].str.contains(str(val))
-            elif op == 'equals':
-                m = df[col]==val
-            elif op == 'not equals':
-                m = df[col]!=val
-            elif op == '>':
-                m = df[col]>val
-            elif op == '<':
-                m = df[col]<val
-            elif op == 'is empty':
-                m = df[col].isnull()
-            elif op == 'not empty':
-                m = ~df[col].isnull()
-            elif op == 'excludes':
-                m = -df[col].str.contains(val)
-            elif op == 'starts with':
-                m = df[col].str.startswith(val)
-            elif op == 'has length':
-                m = df[col].str.len()>val
-            elif op == 'is number':
-                m = df[col].astype('object').str.isnumeric()
-            elif op == 'is lowercase':
-                m = df[col].astype('object').str.islower()
-            elif op == 'is uppercase':
-                m = df[col].astype('object').str.isupper()
-            else:
+            if op not in FilterBar.operators:
                 continue
+            key = (col, op, val, model.getColumnVersion(col))
+            filters.append((key, b))
+
+        #start from the last result for the filters that are the same,
+        #if the rest are AND they only need the rows that passed
+        last = self.lastfilter
+        n = 0
+        steps = []
+        if last is not None and last[0] is start:
+            while n < len(last[1]) and n < len(filters) and last[1][n] == filters[n]:
+                n += 1
+            steps = last[2][:n]
+            if n > 0:
+                mask = steps[-1]
+        narrow = all(b == 'AND' for key,b in filters[n:])
+        for key, b in filters[n:]:
+            col, op, val, v = key
+            m = self.masks.get(key)
+            #a full mask can be cached, so only narrow when it saves a
+            #lot of work, text is slow to compare so narrow it sooner
+            limit = len(mask)/2 if df[col].dtype == object else len(mask)/10
+            if op in SortedIndex.ops and \
+                self.table.model.getColumnIndex(col, request=False) is not None:
+                limit = 0
+            if m is None and narrow and np.count_nonzero(mask) < limit:
+                rows = np.flatnonzero(mask)
+                m = self.evalFilter(df[col].take(rows), op, val)
+                mask = mask.copy()
+                mask[rows[~m]] = False
+                steps.append(mask)
+                continue
+            m = self.getMask(key, lambda: self.getFilterMask(df, col, op, val))
             if b == 'AND':
                 mask = mask & m
             elif b == 'OR':
                 mask = mask | m
             elif b == 'NOT':
                 mask = mask ^ m
+            steps.append(mask)
+        self.lastfilter = (start, filters, steps)
         return mask
 
+    def getFilterMask(self, df, col, op, val):
+        """Mask of one filter over all rows. Comparisons use a sorted
+        index of the column if one is ready, otherwise the column is
+        scanned. An index is made in the background when a column is
+        scanned a second time, e.g. when trying values."""
+
+        if op in SortedIndex.ops:
+            model = self.table.model
+            idx = model.getColumnIndex(col, request=col in self.scanned)
+            self.scanned.add(col)
+            if idx is not None and idx.accepts(val):
+                try:
+                    lo, hi = idx.getRange(op, val)
+                    #setting many rows is slower than scanning numbers
+                    if idx.kind == 'O' or hi-lo < idx.rows/20:
+                        return idx.lookup(op, val)
+                except (TypeError, ValueError):
+                    #value can't be compared with the column
+                    pass
+        return self.evalFilter(df[col], op, val)
+
+    def evalFilter(self, column, op, val):
+        """Boolean mask of a column for one filter, missing values
+        don't match"""
+
+        if op == 'contains':
+            m = column.str.contains(str(val))
+        elif op == 'equals':
+            m = column==val
+        elif op == 'not equals':
+            m = column!=val
+        elif op == '>':
+            m = column>val
+        elif op == '<':
+            m = column<val
+        elif op == 'is empty':
+            m = column.isnull()
+        elif op == 'not empty':
+            m = ~column.isnull()
+        elif op == 'excludes':
+            m = column.str.contains(val) == False
+        elif op == 'starts with':
+            m = column.str.startswith(val)
+        elif op == 'ends with':
+            m = column.str.endswith(val)
+        elif op == 'has length':
+            m = column.str.len()>val
+        elif op == 'is number':
+            m = column.astype('object').str.isnumeric()
+        elif op == 'is lowercase':
+            m = column.astype('object').str.islower()
+        elif op == 'is uppercase':
+            m = column.astype('object').str.isupper()
+        return np.asarray(m.fillna(False), dtype=bool)
+
     def colorResult(self):
         """Color filtered rows in main table"""
 
         table=self.table
-        if not hasattr(self.table,'dataframe') or not hasattr(self, 'filtdf'):
+        if not hasattr(self, 'filtmask'):
+            return
+        if len(self.filtmask) != len(table.model.getUnfiltered()):
             return
         clr = self.table.getaColor('#dcf1fc')
         if clr is None: return
-        df = table.model.df = table.dataframe
-        idx = self.filtdf.index
-        rows = table.multiplerowlist = table.getRowsFromIndex(idx)
+        table.showAll()
+        table.multiplerowlist = table.model.getViewRows(self.filtmask)
+        rows = table.multiplerowlist
         table.setRowColors(rows, clr, cols='all')
         return
 
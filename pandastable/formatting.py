@@ -0,0 +1,642 @@
+#!/usr/bin/env python
+"""
+    Module for formatting table values for display.
+
+    Created October 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import threading
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import numpy as np
+import pandas as pd
+
+#cache of formatted datetimes, keyed on the int64 value
+DATESTRINGS = {}
+MAXDATESTRINGS = 50000
+
+def formatFloats(block, prec=0):
+    """Format a block of float columns. Values below 1 use significant
+    figures and others fixed decimals when a precision is set."""
+
+    x = block.to_numpy(dtype='float64')
+    nulls = np.isnan(x)
+    if prec == 0:
+        s = x.astype(str).astype(object)
+    else:
+        s = np.where(x<1, np.char.mod('%.'+str(prec)+'g', x),
+                          np.char.mod('%.'+str(prec)+'f', x)).astype(object)
+    s[nulls] = ''
+    return s
+
+def formatIntegers(block, prec=0):
+    """Format a block of integer or boolean columns"""
+
+    return block.to_numpy().astype(str).astype(object)
+
+def formatDates(block, prec=0):
+    """Format a block of datetime columns. Each distinct value is only
+    converted to a string once and then cached."""
+
+    x = block.to_numpy(dtype='datetime64[ns]').view('i8')
+    vals, inv = np.unique(x, return_inverse=True)
+    cache = DATESTRINGS
+    if len(cache) > MAXDATESTRINGS:
+        cache.clear()
+    strs = []
+    for v in vals:
+        if v not in cache:
+            ts = pd.Timestamp(v)
+            cache[v] = '' if pd.isnull(ts) else str(ts)
+        strs.append(cache[v])
+    strs = np.array(strs, dtype=object)
+    return strs[inv].reshape(x.shape)
+
+def formatCategories(block, prec=0):
+    """Format a block of categorical columns. Each category is formatted
+    once and the codes used to look up the strings."""
+
+    cols = []
+    for i in range(len(block.columns)):
+        c = block.iloc[:,i]
+        cats = np.array([str(v) for v in c.cat.categories]+[''], dtype=object)
+        cols.append(cats[c.cat.codes.values])
+    return np.column_stack(cols)
+
+def formatObjects(block, prec=0):
+    """Format a block of any other columns, nulls are empty strings"""
+
+    x = block.to_numpy(dtype=object)
+    s = np.array([str(v) for v in x.ravel()], dtype=object).reshape(x.shape)
+    s[pd.isnull(x)] = ''
+    return s
+
+#formatters by kind of column, see getFormatterKind
+formatters = {'float': formatFloats,
+              'int': formatIntegers,
+              'datetime': formatDates,
+              'category': formatCategories,
+              'object': formatObjects}
+
+def setFormatter(kind, func):
+    """Set the function used to format columns of a kind. It is called with
+    a dataframe block of those columns and the float precision and should
+    return a 2-D array of strings of the same shape."""
+
+    formatters[kind] = func
+    return
+
+def getFormatterKind(dtype):
+    """Get the formatter kind for a column dtype"""
+
+    if dtype.name == 'category':
+        return 'category'
+    elif dtype == 'float64':
+        return 'float'
+    elif dtype.kind in 'iub' and not pd.api.types.is_extension_array_dtype(dtype):
+        return 'int'
+    elif dtype.kind == 'M' and not hasattr(dtype, 'tz'):
+        return 'datetime'
+    return 'object'
+
+def formatBlock(df, rows, cols, prec=0):
+    """Format the block of a dataframe given by contiguous row positions
+    and column positions. Columns are grouped by kind so that each kind is
+    formatted in one pass.
+
+    Returns:
+        2-D numpy array of display strings, rows x cols
+    """
+
+    block = df.iloc[rows[0]:rows[-1]+1]
+    dtypes = block.dtypes
+    groups = {}
+    for j,c in enumerate(cols):
+        kind = getFormatterKind(dtypes.iloc[c])
+        if kind not in groups:
+            groups[kind] = []
+        groups[kind].append(j)
+    result = np.empty((len(rows), len(cols)), dtype=object)
+    for kind in groups:
+        j = groups[kind]
+        sub = block.iloc[:, [cols[i] for i in j]]
+        func = formatters.get(kind, formatObjects)
+        result[:, j] = func(sub, prec)
+    return result
+
+class PageCache(object):
+    """LRU cache of formatted pages of a table, each pagerows x pagecols
+    cells, keyed on (model version, row page, column page, precision).
+    Pages next to the view can be formatted ahead of time by a background
+    thread so that scrolling mostly finds them ready. Pages are dropped
+    when the version changes or the memory used goes over maxsize bytes."""
+
+    def __init__(self, pagerows=64, pagecols=16, maxsize=32*1024**2):
+        self.pagerows = pagerows
+        self.pagecols = pagecols
+        self.maxsize = maxsize
+        self.pages = OrderedDict()
+        self.size = 0
+        self.version = None
+        #bumped by clear so pages being formatted then are not stored
+        self.generation = 0
+        self.stats = {'hits':0, 'misses':0, 'prefetched':0}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.worker = None
+        return
+
+    def clear(self):
+        """Remove all pages"""
+
+        with self.lock:
+            self.pages = OrderedDict()
+            self.size = 0
+            self.pending = set()
+            self.generation += 1
+        return
+
+    def setVersion(self, version):
+        """Drop all pages if the data version has changed"""
+
+        if version != self.version:
+            self.clear()
+            self.version = version
+        return
+
+    def changeCells(self, oldversion, version, cells, cols=[]):
+        """Move pages to a new data version in which only the given
+        (row, col) cells and whole columns changed. Pages holding those
+        are dropped, the rest are kept."""
+
+        if oldversion != self.version:
+            self.setVersion(version)
+            return
+        R, C = self.pagerows, self.pagecols
+        drop = set((row//R, col//C) for row, col in cells)
+        dropcols = set(col//C for col in cols)
+        with self.lock:
+            pages = OrderedDict()
+            for key in self.pages:
+                page, n = self.pages[key]
+                if key[1:3] in drop or key[2] in dropcols:
+                    self.size -= n
+                    continue
+                pages[(version,)+key[1:]] = (page, n)
+            self.pages = pages
+            self.pending = set()
+            self.version = version
+        return
+
+    def formatPage(self, df, key):
+        """Format the cells of a page"""
+
+        version, rp, cp, prec = key
+        R, C = self.pagerows, self.pagecols
+        rows = range(rp*R, min((rp+1)*R, len(df)))
+        cols = range(cp*C, min((cp+1)*C, len(df.columns)))
+        return formatBlock(df, rows, cols, prec)
+
+    def store(self, key, page, generation=None):
+        """Add a page, removing the least recently used ones over the
+        memory limit. Strings are counted at about 50 bytes plus length.
+        The page is not added if the cache was cleared since generation."""
+
+        size = page.size*50 + sum(len(i) for i in page.ravel())
+        with self.lock:
+            if key[0] != self.version or key in self.pages:
+                return
+            if generation is not None and generation != self.generation:
+                return
+            self.pages[key] = (page, size)
+            self.size += size
+            while self.size > self.maxsize and len(self.pages) > 1:
+                k, (p, n) = self.pages.popitem(last=False)
+                self.size -= n
+        return
+
+    def getPage(self, df, key):
+        """Get a page, formatting it now if not cached"""
+
+        with self.lock:
+            item = self.pages.get(key)
+            if item is not None:
+                self.pages.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0]
+            self.stats['misses'] += 1
+            generation = self.generation
+        page = self.formatPage(df, key)
+        self.store(key, page, generation)
+        return page
+
+    def getBlock(self, df, version, rows, cols, prec=0):
+        """Formatted strings for contiguous rows and cols, taken from
+        the cached pages. Same result as formatBlock."""
+
+        self.setVersion(version)
+        R, C = self.pagerows, self.pagecols
+        r0, r1 = rows[0], rows[-1]+1
+        c0, c1 = cols[0], cols[-1]+1
+        result = np.empty((r1-r0, c1-c0), dtype=object)
+        for rp in range(r0//R, (r1-1)//R+1):
+            for cp in range(c0//C, (c1-1)//C+1):
+                page = self.getPage(df, (version, rp, cp, prec))
+                pr, pc = rp*R, cp*C
+                a, b = max(r0, pr), min(r1, pr+page.shape[0])
+                c, d = max(c0, pc), min(c1, pc+page.shape[1])
+                result[a-r0:b-r0, c-c0:d-c0] = page[a-pr:b-pr, c-pc:d-pc]
+        return result
+
+    def prefetch(self, df, version, rows, cols, prec=0):
+        """Queue the pages around the given rows and cols to be formatted
+        in the background"""
+
+        self.setVersion(version)
+        R, C = self.pagerows, self.pagecols
+        rp0, rp1 = rows[0]//R, rows[-1]//R
+        cp0, cp1 = cols[0]//C, cols[-1]//C
+        nr = (len(df)-1)//R
+        nc = (len(df.columns)-1)//C
+        keys = [(rp, cp) for rp in (rp0-1, rp1+1) for cp in range(cp0, cp1+1)]
+        keys += [(rp, cp) for rp in range(rp0, rp1+1) for cp in (cp0-1, cp1+1)]
+        with self.lock:
+            for rp, cp in keys:
+                key = (version, rp, cp, prec)
+                if rp < 0 or cp < 0 or rp > nr or cp > nc:
+                    continue
+                if key in self.pages or key in self.pending:
+                    continue
+                self.pending.add(key)
+                self.queue.put((df, key))
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self.work)
+            self.worker.daemon = True
+            self.worker.start()
+        return
+
+    def work(self):
+        """Background thread formatting queued pages"""
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            df, key = item
+            with self.lock:
+                if key not in self.pending:
+                    continue
+                generation = self.generation
+            try:
+                page = self.formatPage(df, key)
+            except Exception:
+                #data changed while formatting, page is no longer needed
+                page = None
+            with self.lock:
+                self.pending.discard(key)
+            if page is not None:
+                self.store(key, page, generation)
+                self.stats['prefetched'] += 1
+        return
+
+    def stop(self):
+        """Stop the background thread"""
+
+        if self.worker is not None:
+            self.queue.put(None)
+            self.worker = None
+        return
+
+class RowColors(object):
+    """Cell colors set on a table, stored as a palette of unique colors and
+    a small integer code array per column. Code 0 means no color. Rows are
+    in the order of index, which is kept so colors stay with their rows
+    when the table is reordered."""
+
+    def __init__(self, index=None):
+        if index is None:
+            index = pd.RangeIndex(0)
+        self.index = index
+        self.palette = [np.nan]
+        self.codes = {}
+        self._lookup = {}
+        self._indexer = None
+        return
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, col):
+        return col in self.codes
+
+    def __getitem__(self, col):
+        return pd.Series(self.getColors(col), index=self.index, name=col)
+
+    def __setitem__(self, col, colors):
+        if isinstance(colors, pd.Series):
+            colors = colors.reindex(self.index).values
+        self.setColors(col, colors)
+
+    @property
+    def columns(self):
+        return list(self.codes.keys())
+
+    def getDtype(self):
+        """Smallest integer type that holds the palette codes"""
+
+        n = len(self.palette)
+        if n <= 256:
+            return np.uint8
+        elif n <= 65536:
+            return np.uint16
+        return np.uint32
+
+    def addColor(self, clr):
+        """Get the code for a color, adding it to the palette if needed"""
+
+        if clr in self._lookup:
+            return self._lookup[clr]
+        dtype = self.getDtype()
+        code = len(self.palette)
+        self.palette.append(clr)
+        self._lookup[clr] = code
+        if self.getDtype() != dtype:
+            for c in self.codes:
+                self.codes[c] = self.codes[c].astype(self.getDtype())
+        return code
+
+    def encode(self, colors):
+        """Get the codes for an array of colors, nulls are code 0"""
+
+        inv, vals = pd.factorize(np.asarray(colors, dtype=object))
+        lut = np.array([self.addColor(v) for v in vals]+[0])
+        return lut[inv].astype(self.getDtype())
+
+    def setColors(self, col, colors, rows=None):
+        """Set colors in a column.
+
+        Args:
+            col: column name
+            colors: a color or array of colors for the rows
+            rows: row positions or boolean mask, default all rows
+        """
+
+        if col not in self.codes:
+            self.codes[col] = np.zeros(len(self.index), dtype=self.getDtype())
+        if rows is None:
+            rows = slice(None)
+        if np.ndim(colors) == 0:
+            code = 0 if pd.isnull(colors) else self.addColor(colors)
+            self.codes[col][rows] = code
+        else:
+            codes = self.encode(colors)
+            self.codes[col][rows] = codes
+        return
+
+    def getCodes(self, col, start=0, end=None, indexer=None):
+        """Get the color codes of a column for a range of rows. If indexer
+        is given it maps the rows to positions in this object."""
+
+        codes = self.codes[col]
+        if indexer is None:
+            return codes[start:end]
+        ix = indexer[start:end]
+        c = codes[ix]
+        c[ix<0] = 0
+        return c
+
+    def getColors(self, col, start=0, end=None, indexer=None):
+        """Get the colors of a column for a range of rows, NaN for none"""
+
+        palette = np.array(self.palette, dtype=object)
+        return palette[self.getCodes(col, start, end, indexer)]
+
+    def getIndexer(self, index):
+        """Get positions in this object for the rows of a table index, or
+        None if the rows are in the same order. Missing rows are -1. The
+        result is kept for the index object, which is immutable."""
+
+        key = self._indexer
+        if key is not None and key[0] is self.index and key[1] is index:
+            return key[2]
+        if self.index.equals(index):
+            indexer = None
+        else:
+            indexer = self.index.get_indexer(index)
+        self._indexer = (self.index, index, indexer)
+        return indexer
+
+    def setIndex(self, index):
+        """Set row labels, the number of rows must not change"""
+
+        self.index = index
+        return
+
+    def append(self, index):
+        """Add rows with no colors"""
+
+        n = len(index)
+        self.index = self.index.append(index)
+        for c in self.codes:
+            self.codes[c] = np.concatenate([self.codes[c],
+                                            np.zeros(n, dtype=self.getDtype())])
+        return
+
+    def takeRows(self, indexer, index):
+        """Keep the rows at the indexer positions, -1 for new rows with
+        no colors. Used when table rows are inserted or deleted."""
+
+        new = indexer < 0
+        for c in self.codes:
+            codes = self.codes[c]
+            if len(codes) > 0:
+                codes = codes[np.where(new, 0, indexer)]
+            else:
+                codes = np.zeros(len(indexer), dtype=self.getDtype())
+            codes[new] = 0
+            self.codes[c] = codes
+        self.index = index
+        return
+
+    def memory_usage(self):
+        """Bytes used by the codes and palette"""
+
+        b = sum(self.codes[c].nbytes for c in self.codes)
+        b += sum(len(str(p)) for p in self.palette)
+        return b
+
+    def toDataFrame(self):
+        """Get the colors as a dataframe of colors, one column per colored
+        column"""
+
+        df = pd.DataFrame(index=self.index)
+        for c in self.codes:
+            df[c] = self.getColors(c)
+        return df
+
+    def getData(self):
+        """Get the palette and codes for saving"""
+
+        codes = pd.DataFrame(self.codes, index=self.index)
+        return {'palette': self.palette[1:], 'codes': codes}
+
+    @classmethod
+    def fromData(cls, data):
+        """Create from data saved with getData, or from a dataframe of
+        colors as saved by older versions"""
+
+        if isinstance(data, pd.DataFrame):
+            rc = cls(data.index)
+            for c in data.columns:
+                rc.setColors(c, data[c].values)
+            return rc
+        codes = data['codes']
+        rc = cls(codes.index)
+        for clr in data['palette']:
+            rc.addColor(clr)
+        for c in codes.columns:
+            rc.codes[c] = codes[c].values.astype(rc.getDtype())
+        return rc
+
+#colormap lookup tables, keyed on (cmap, alpha)
+COLORMAPS = {}
+
+def getColormap(cmap='jet', alpha=1):
+    """Get a 256 entry lookup table of hex colors for a matplotlib
+    colormap"""
+
+    key = (cmap, alpha)
+    if key not in COLORMAPS:
+        import matplotlib as mpl
+        import pylab as plt
+        cm = plt.cm.get_cmap(cmap)
+        clrs = mpl.colors.to_rgba_array(cm(np.linspace(0,1,256)), alpha)
+        COLORMAPS[key] = np.array([mpl.colors.rgb2hex(i) for i in clrs],
+                                  dtype=object)
+    return COLORMAPS[key]
+
+#conditional formatting rules are dicts with a 'type' key and options
+ruletypes = {'colormap': {'cmap':'jet', 'alpha':1.0},
+             'threshold': {'op':'>', 'value':0, 'color':'#F7DC6F'},
+             'topn': {'n':10, 'largest':True, 'color':'#82E0AA'},
+             'nulls': {'color':'#F1948A'}}
+
+operators = {'>': np.greater, '<': np.less, '>=': np.greater_equal,
+             '<=': np.less_equal, '==': np.equal, '!=': np.not_equal}
+
+def makeRule(kind, **kwargs):
+    """Make a rule of the given type, missing options are set to the
+    defaults in ruletypes"""
+
+    rule = {'type': kind}
+    rule.update(ruletypes[kind])
+    rule.update(kwargs)
+    return rule
+
+def getRuleStats(s, rules):
+    """Get the whole column values that each rule of a column needs, so
+    that the rules can then be applied to any block of rows. These only
+    change when the data does.
+
+    Returns:
+        a dict of stats for each rule
+    """
+
+    stats = []
+    for r in rules:
+        kind = r['type']
+        st = {}
+        if kind == 'colormap':
+            if s.dtype.kind in 'biufmM':
+                x = s.values
+                if x.dtype.kind in 'mM':
+                    x = x.view('i8').astype('float64')
+                    x[s.isnull().values] = np.nan
+                x = x.astype('float64')
+                if len(x) == 0 or np.all(np.isnan(x)):
+                    st['min'] = st['max'] = 0
+                else:
+                    st['min'], st['max'] = np.nanmin(x), np.nanmax(x)
+            else:
+                #other types are colored by their sorted categories
+                st['categories'] = np.sort(pd.unique(s.dropna().astype(str)))
+        elif kind == 'topn' and s.dtype.kind in 'biuf':
+            x = s.dropna()
+            n = min(int(r['n']), len(x))
+            if n > 0 and r['largest'] == True:
+                st['cut'] = x.nlargest(n).iloc[-1]
+            elif n > 0:
+                st['cut'] = x.nsmallest(n).iloc[-1]
+        stats.append(st)
+    return stats
+
+def applyRules(values, rules, stats):
+    """Get colors for an array of values from the rules of a column and
+    their stats from getRuleStats. Later rules take priority.
+
+    Returns:
+        object array of colors, None where no rule applies
+    """
+
+    colors = np.full(len(values), None, dtype=object)
+    nulls = pd.isnull(values)
+    for r,st in zip(rules, stats):
+        kind = r['type']
+        if kind == 'colormap':
+            #scale values to an index into the lookup table
+            lut = getColormap(r['cmap'], r['alpha'])
+            if 'categories' in st:
+                cats = st['categories']
+                if len(cats) == 0:
+                    continue
+                i = np.searchsorted(cats, values.astype(str))
+                i = np.clip(i,0,len(cats)-1)*255/max(len(cats)-1,1)
+            else:
+                x = values
+                if x.dtype.kind in 'mM':
+                    x = x.view('i8')
+                x = x.astype('float64')
+                rng = st['max']-st['min']
+                if rng == 0:
+                    rng = 1
+                i = np.nan_to_num((x-st['min'])/rng*255)
+            i = np.clip(i,0,255).astype(int)
+            colors[~nulls] = lut[i[~nulls]]
+        elif kind == 'threshold':
+            func = operators[r['op']]
+            try:
+                mask = func(values, r['value'])
+            except TypeError:
+                mask = func(values.astype(str), str(r['value']))
+            colors[np.asarray(mask, dtype=bool) & ~nulls] = r['color']
+        elif kind == 'topn':
+            if 'cut' not in st:
+                continue
+            if r['largest'] == True:
+                mask = values >= st['cut']
+            else:
+                mask = values <= st['cut']
+            colors[np.asarray(mask, dtype=bool) & ~nulls] = r['color']
+        elif kind == 'nulls':
+            colors[nulls] = r['color']
+    return colors
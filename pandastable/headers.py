@@ -33,7 +33,9 @@ import numpy as np
 import pandas as pd
 from . import util
 from .dialogs import *
+from .selection import RangeList
 import textwrap
+from collections import OrderedDict
 
 def createSubMenu(parent, label, commands):
     menu = Menu(parent, tearoff = 0)
@@ -77,6 +79,10 @@ class ColumnHeader(Canvas):
             self.thefont = self.table.thefont
             self.wrap = False
             self.setDefaults()
+        #header layout and the state it was computed for
+        self.layoutkey = None
+        self.drawnkey = None
+        self.labels = {}
         return
 
     def setDefaults(self):
@@ -84,24 +90,40 @@ class ColumnHeader(Canvas):
         self.sort_ascending = 1
         return
 
-    def redraw(self):
-        """Redraw column header"""
-
+    def getLayoutKey(self):
+        """Key for the state the header layout depends on"""
+
+        table = self.table
+        #index objects are immutable and the position array is only
+        #rebuilt when widths change, so identity marks a new version
+        return (self.model.df.columns, table.col_positions, self.wrap,
+                table.getFontKey(), table.rowheight, table.getScale())
+
+    def updateLayout(self):
+        """Compute the header height and level positions. This is only
+        done when the columns, their widths or the font have changed,
+        labels are then truncated or wrapped once per column as needed."""
+
+        key = self.getLayoutKey()
+        old = self.layoutkey
+        if old is not None and all(a is b for a,b in zip(old[:2], key[:2])) \
+            and old[2:] == key[2:]:
+            return False
+        self.layoutkey = key
+        self.labels = {}
         wrap = self.wrap
         df = self.model.df
-        cols = self.model.getColumnCount()
         colwidths = self.table.columnwidths
-        scale = self.table.getScale() * 1.5
         self.height = self.table.rowheight
 
-        if wrap is True:
+        if wrap is True and len(df.columns) > 0:
             #set height from longest column wrapped
             try:
                 c = list(df.columns.map(str).str.len())
             except:
                 c = [len(str(i)) for i in df.columns]
             idx = c.index(max(c))
-            longest = str(df.columns[idx].encode('utf-8').decode('utf-8'))
+            longest = str(df.columns[idx])
             if longest in colwidths:
                 cw = colwidths[longest]
             else:
@@ -111,90 +133,143 @@ class ColumnHeader(Canvas):
             tr = len(textwrap.wrap(longest, l))
             if tr > 1:
                 self.height = tr*self.height
-            #print (tr, longest, textwrap.wrap(longest, l))
 
         if self.height>250:
             self.height=250
 
-        self.tablewidth=self.table.tablewidth
-        self.thefont = self.table.thefont
-        self.configure(scrollregion=(0,0,
-                                     self.table.tablewidth+self.table.x_start,
-                                     self.height))
-        self.config(height=self.height)
-        self.delete('gridline','text')
-        self.delete('rect')
-        self.delete('dragrect')
-        self.atdivider = None
-        font = self.thefont
         anchor = 'w'
-        pad = 5
-
-        x_start = self.table.x_start
-        if cols == 0:
-            return
-
         if util.check_multiindex(df.columns) == 1:
             anchor = 'nw'
-            y=2
-            #print (df)
-            levels = df.columns.levels
+            nlevels = len(df.columns.levels)
             h = self.height
-            self.height *= len(levels)
+            self.height *= nlevels
             y=3
         else:
-            levels = [df.columns.values]
+            nlevels = 1
             h = self.height
             y = h/2
-        i=0
-        #iterate over index levels
-        for level in levels:
-            values = df.columns.get_level_values(i)
-            for col in self.table.visiblecols:
-                colname = values[col]
-                try:
-                    colstr = colname.encode('utf-8','ignore').decode('utf-8')
-                except:
-                    colstr = str(colname)
-                if colstr in colwidths:
-                    w = colwidths[colstr]
-                else:
-                    w = self.table.cellwidth
-                if w<=8:
-                    colname=''
-                x = self.table.col_positions[col]
-                if anchor in ['w','nw']:
-                    xt = x+pad
-                elif anchor == 'e':
-                    xt = x+w-pad
-                elif anchor == 'center':
-                    xt = x-w/2
-
-                colname = colstr
-                tw,length = util.getTextLength(colstr, w-pad, font=font)
-                if wrap is True:
-                    colname = textwrap.fill(colstr, length-1)
-                    y=3
-                    anchor = 'nw'
-                else:
-                    colname = colname[0:int(length)]
+        if wrap is True:
+            y=3
+            anchor = 'nw'
+        #y position of each level, kept for redrawing on scroll
+        self.levelpos = [y+i*(h-2) for i in range(nlevels)]
+        self.anchor = anchor
+        self.levelvalues = [np.asarray(df.columns.get_level_values(i), dtype=object)
+                            for i in range(nlevels)]
+        return True
+
+    def getLabels(self, col):
+        """Get the displayed label of a column for each level, truncated
+        or wrapped to the column width. Cached per layout."""
+
+        if col in self.labels:
+            return self.labels[col]
+        pad = 5
+        w = self.table.getColumnWidth(col)
+        labels = []
+        for values in self.levelvalues:
+            colname = values[col]
+            try:
+                colstr = colname.encode('utf-8','ignore').decode('utf-8')
+            except:
+                colstr = str(colname)
+            tw,length = util.getTextLength(colstr, w-pad, font=self.thefont)
+            if self.wrap is True:
+                colname = textwrap.fill(colstr, length-1)
+            else:
+                colname = colstr[0:int(length)]
+            labels.append(colname)
+        self.labels[col] = labels
+        return labels
+
+    def redraw(self):
+        """Redraw column header. The layout is only recomputed when the
+        columns, widths or font change and nothing is drawn if the same
+        columns are already shown."""
+
+        cols = self.model.getColumnCount()
+        self.tablewidth=self.table.tablewidth
+        self.thefont = self.table.thefont
+        self.updateLayout()
+        v = self.table.visiblecols
+        if cols == 0 or len(v) == 0:
+            self.delete('gridline','text','rect','dragrect')
+            self.drawnkey = None
+            return
+        key = (self.layoutkey, v[0], v[-1]+1)
+        if self.drawnkey is not None and self.drawnkey[0] is key[0] \
+            and self.drawnkey[1:] == key[1:]:
+            return
+        self.delete('rect')
+        self.delete('dragrect')
+        self.atdivider = None
 
-                line = self.create_line(x, 0, x, self.height, tag=('gridline', 'vertline'),
-                                     fill='white', width=1)
-                self.create_text(xt,y,
-                                    text=colname,
+        self.configure(scrollregion=(0,0,
+                                     self.table.tablewidth+self.table.x_start,
+                                     self.height))
+        self.config(height=self.height)
+        self.delete('gridline','text')
+        self.drawColumns(v[0], v[-1]+1)
+        self.drawEndLine()
+        self.drawncols = (v[0], v[-1]+1)
+        self.drawnkey = key
+        return
+
+    def drawColumns(self, start, end):
+        """Draw the labels of columns start to end, for each level"""
+
+        anchor = self.anchor
+        pad = 5
+        for col in range(start, end):
+            labels = self.getLabels(col)
+            w = self.table.getColumnWidth(col)
+            x = self.table.col_positions[col]
+            if anchor in ['w','nw']:
+                xt = x+pad
+            elif anchor == 'e':
+                xt = x+w-pad
+            elif anchor == 'center':
+                xt = x-w/2
+            tag = 'col'+str(col)
+            self.create_line(x, 0, x, self.height, tag=('gridline', 'vertline', tag),
+                             fill='white', width=1)
+            for i in range(len(self.levelpos)):
+                self.create_text(xt,self.levelpos[i],
+                                    text=labels[i],
                                     fill='white',
                                     font=self.thefont,
-                                    tag='text', anchor=anchor)
+                                    tag=('text', tag), anchor=anchor)
+        return
 
-            x = self.table.col_positions[col+1]
-            self.create_line(x,0, x, self.height, tag='gridline',
-                            fill='white', width=2)
-            i+=1
-            y=y+h-2
-            #line = self.create_line(0, y, self.tablewidth, y, tag=('gridline', 'vertline'),
-            #                    fill='white', width=1)
-        self.config(height=self.height)
+    def drawEndLine(self):
+        """Draw the line after the last visible column"""
+
+        self.delete('endline')
+        x = self.table.col_positions[self.table.visiblecols[-1]+1]
+        self.create_line(x,0, x, self.height, tag=('gridline','endline'),
+                         fill='white', width=2)
+        return
+
+    def redrawScrolled(self):
+        """Redraw after a horizontal scroll, only columns that came into
+        view are drawn and those that left are removed"""
+
+        v = self.table.visiblecols
+        old = getattr(self, 'drawncols', None)
+        new = (v[0], v[-1]+1)
+        if old is None or self.drawnkey is None or self.updateLayout() or \
+            new[0] >= old[1] or new[1] <= old[0]:
+            self.drawnkey = None
+            self.redraw()
+            return
+        for c0,c1 in util.getRangeDifference(old, new):
+            for col in range(c0,c1):
+                self.delete('col'+str(col))
+        for c0,c1 in util.getRangeDifference(new, old):
+            self.drawColumns(c0, c1)
+        self.drawEndLine()
+        self.drawncols = new
+        self.drawnkey = (self.layoutkey, new[0], new[1])
         return
 
     def handle_left_click(self,event):
@@ -276,7 +351,7 @@ class ColumnHeader(Canvas):
         if self.atdivider == 1:
             self.table.delete('resizeline')
             self.delete('resizeline')
-            self.table.create_line(x, 0, x, self.table.rowheight*self.table.rows,
+            self.table.create_line(x, 0, x, self.table.getRowExtent()[1],
                                 width=2, fill='gray', tag='resizeline')
             self.create_line(x, 0, x, self.height,
                                 width=2, fill='gray', tag='resizeline')
@@ -296,9 +371,10 @@ class ColumnHeader(Canvas):
 
     def within(self, val, l, d):
         """Utility funtion to see if val is within d of any
-            items in the list l"""
+            items in the sorted array l"""
 
-        for v in l:
+        i = np.searchsorted(l, val)
+        for v in l[max(i-1,0):i+1]:
             if abs(val-v) <= d:
                 return v
         return None
@@ -326,7 +402,7 @@ class ColumnHeader(Canvas):
 
         if x != x_start and nearest != None:
             #col = self.table.get_col_clicked(event)
-            col = self.table.col_positions.index(nearest)-1
+            col = int(np.searchsorted(self.table.col_positions, nearest))-1
             self.nearestcol = col
             #print (nearest,col,self.model.df.columns[col])
             if col == None:
@@ -349,9 +425,9 @@ class ColumnHeader(Canvas):
         currcol = self.table.currentcol
         colclicked = self.table.get_col_clicked(event)
         if colclicked > currcol:
-            self.table.multiplecollist = list(range(currcol, colclicked+1))
+            self.table.multiplecollist = range(currcol, colclicked+1)
         elif colclicked < currcol:
-            self.table.multiplecollist = list(range(colclicked, currcol+1))
+            self.table.multiplecollist = range(colclicked, currcol+1)
         else:
             return
         for c in self.table.multiplecollist:
@@ -420,6 +496,8 @@ class ColumnHeader(Canvas):
                          }
         formatcommands = {'Set Color': self.table.setColumnColors,
                           'Color by Value': self.table.setColorbyValue,
+                          'Conditional Format': self.table.setConditionalFormat,
+                          'Clear Conditional Formats': self.table.clearColorRules,
                           'Alignment': self.table.setAlignment,
                           'Wrap Header' : self.table.setWrap
                          }
@@ -436,6 +514,7 @@ class ColumnHeader(Canvas):
         popupmenu.add_command(label="Apply Function", command=self.table.applyColumnFunction)
         popupmenu.add_command(label="Resample/Transform", command=self.table.applyTransformFunction)
         popupmenu.add_command(label="Value Counts", command=self.table.valueCounts)
+        popupmenu.add_command(label="Jump to Value", command=self.table.jumpToValue)
         popupmenu.add_command(label="String Operation", command=self.table.applyStringMethod)
         popupmenu.add_command(label="Date/Time Conversion", command=self.table.convertDates)
         createSubMenu(popupmenu, 'Column', columncommands)
@@ -532,84 +611,215 @@ class RowHeader(Canvas):
                 self.bind("<Button-3>", self.handle_right_click)
             self.bind('<B1-Motion>', self.handle_mouse_drag)
             self.bind('<Shift-Button-1>', self.handle_left_shift_click)
+        self.widths = []
+        #formatted labels in chunks of rows, for the index they came from
+        self._labels = OrderedDict()
+        self._labelkey = None
+        #pooled items per (row slot, level) and the row each shows
+        self._pool = {}
+        self._poolsize = 0
+        self._slots = {}
         return
 
+    chunksize = 256
+    maxchunks = 64
+
     def redraw(self, align='w', showkeys=False):
-        """Redraw row header"""
+        """Redraw row header. Label items are reused and only moved and
+        updated."""
 
-        self.height = self.table.rowheight * self.table.rows+10
+        if self.table.isVirtual():
+            self.height = self.table.master.winfo_height()
+        else:
+            self.height = self.table.rowheight * self.table.rows+10
         self.configure(scrollregion=(0,0, self.width, self.height))
-        self.delete('rowheader','text')
         self.delete('rect')
 
-        xstart = 1
-        pad = 5
-        maxw = self.maxwidth
         v = self.table.visiblerows
         if len(v) == 0:
+            self.delete('rowheader','text')
+            self._pool = {}
+            self._slots = {}
             return
-        scale = self.table.getScale()
-        h = self.table.rowheight
-        index = self.model.df.index
-        names = index.names
+        cols, widths, xpos = self.getLabels(v)
+        w = np.sum(widths)
+        self.widths = widths
+        self.xpos = xpos
+        if w>self.maxwidth:
+            w = self.maxwidth
+        elif w<45:
+            w = 45
 
-        if self.table.showindex == True:
+        if self.width != w:
+            self.config(width=w)
+            self.width = w
+        self.align = align
+        #hide pooled items left showing rows that are not drawn now
+        shown = self._slots
+        self._slots = {}
+        self._poolsize = max(self._poolsize, len(v))
+        self.drawRows(v[0], cols)
+        for key in shown:
+            if key not in self._slots:
+                self.hideSlot(key)
+        self.drawnrows = (v[0], v[-1]+1)
+        return
+
+    def getLabelChunk(self, k):
+        """Get the formatted labels of a chunk of rows and their lengths,
+        one array per index level. Chunks are cached until the index or
+        showindex changes."""
+
+        index = self.model.df.index
+        showindex = self.table.showindex
+        key = self._labelkey
+        #index objects are immutable so can be used as the version
+        if key is None or key[0] is not index or key[1] != showindex:
+            self._labels = OrderedDict()
+            self._labelkey = (index, showindex)
+        labels = self._labels
+        if k in labels:
+            labels.move_to_end(k)
+            return labels[k]
+
+        r0 = k*self.chunksize
+        r1 = min(r0+self.chunksize, len(index))
+        if showindex == True:
+            ind = index[r0:r1]
             if util.check_multiindex(index) == 1:
-                ind = index.values[v]
-                cols = [pd.Series(i).astype('object').astype(str)\
-                        .replace('nan','') for i in list(zip(*ind))]
-                nl = [len(n) if n is not None else 0 for n in names]
-                l = [c.str.len().max() for c in cols]
-                #pick higher of index names and row data
-                l = list(np.maximum(l,nl))
-                widths = [i * scale + 6 for i in l]
-                xpos = [0]+list(np.cumsum(widths))[:-1]
+                cols = [pd.Series(ind.get_level_values(i)).astype('object')\
+                        .astype(str).replace('nan','') for i in range(ind.nlevels)]
             else:
-                ind = index[v]
-                dtype = ind.dtype
-                #print (type(ind))
                 if type(ind) is pd.CategoricalIndex:
                     ind = ind.astype('str')
-                r = ind.fillna('').astype('object').astype('str')
-                l = r.str.len().max()
-                widths = [l * scale + 6]
-                cols = [r]
-                xpos = [xstart]
-            w = np.sum(widths)
+                cols = [pd.Series(ind.fillna('').astype('object').astype('str'))]
+            lengths = [c.str.len().values for c in cols]
+            cols = [c.values for c in cols]
+        else:
+            cols = [np.arange(r0+1, r1+1).astype(str)]
+            lengths = [np.char.str_len(cols[0])]
+        labels[k] = (cols, lengths)
+        if len(labels) > self.maxchunks:
+            labels.popitem(last=False)
+        return labels[k]
+
+    def getLabels(self, v):
+        """Get the label columns, their widths and x positions for the
+        given rows"""
+
+        xstart = 1
+        scale = self.table.getScale()
+        index = self.model.df.index
+        names = index.names
+        start, end = v[0], v[-1]+1
+        n = self.chunksize
+        cols = None
+        for k in range(start//n, (end-1)//n+1):
+            c, l = self.getLabelChunk(k)
+            a, b = max(start-k*n, 0), min(end-k*n, n)
+            if cols is None:
+                cols = [[] for i in c]
+                lengths = [[] for i in c]
+            for i in range(len(c)):
+                cols[i].append(c[i][a:b])
+                lengths[i].append(l[i][a:b])
+        cols = [np.concatenate(c) for c in cols]
+        l = [np.concatenate(i).max() for i in lengths]
+
+        if self.table.showindex == True and util.check_multiindex(index) == 1:
+            nl = [len(n) if n is not None else 0 for n in names]
+            #pick higher of index names and row data
+            l = list(np.maximum(l,nl))
+            widths = [i * scale + 6 for i in l]
+            xpos = [0]+list(np.cumsum(widths))[:-1]
         else:
-            rows = [i+1 for i in v]
-            cols = [rows]
-            l = max([len(str(i)) for i in rows])
-            w = l * scale + 6
-            widths = [w]
+            widths = [l[0] * scale + 6]
             xpos = [xstart]
+        return cols, widths, xpos
 
-        self.widths = widths
-        if w>maxw:
-            w = maxw
-        elif w<45:
-            w = 45
+    def hideSlot(self, key):
+        """Hide the pooled items of a slot"""
 
-        if self.width != w:
-            self.config(width=w)
-            self.width = w
+        rect, text = self._pool[key]
+        self.itemconfigure(rect, state='hidden', tags='rowheader')
+        self.itemconfigure(text, state='hidden', tags='text')
+        self._slots.pop(key, None)
+        return
 
+    def drawRows(self, start, cols):
+        """Draw row labels from row start, cols are the label columns
+        from getLabels. Pooled items are reused where possible."""
+
+        pad = 5
+        w = self.width
+        h = self.table.rowheight
+        y_start = self.table.getRowOrigin()
+        size = self._poolsize
+        font = self.table.thefont
         i=0
         for col in cols:
-            r=v[0]
-            x = xpos[i]
-            i+=1
-            #col=pd.Series(col.tolist()).replace('nan','')
-            for row in col:
-                text = row
-                x1,y1,x2,y2 = self.table.getCellCoords(r,0)
-                self.create_rectangle(x,y1,w-1,y2, fill=self.color,
-                                        outline='white', width=1,
-                                        tag='rowheader')
-                self.create_text(x+pad,y1+h/2, text=text,
-                                  fill='black', font=self.table.thefont,
-                                  tag='text', anchor=align)
+            r=start
+            x = self.xpos[i]
+            for text in col:
+                y1 = y_start+h*r
+                tag = 'row'+str(r)
+                key = (r % size, i)
+                items = self._pool.get(key)
+                if items is None:
+                    rect = self.create_rectangle(x,y1,w-1,y1+h, fill=self.color,
+                                            outline='white', width=1,
+                                            tag=('rowheader',tag))
+                    item = self.create_text(x+pad,y1+h/2, text=text,
+                                      fill='black', font=font,
+                                      tag=('text',tag), anchor=self.align)
+                    self._pool[key] = (rect, item)
+                else:
+                    rect, item = items
+                    self.coords(rect, x,y1,w-1,y1+h)
+                    self.itemconfigure(rect, fill=self.color, state='normal',
+                                       tags=('rowheader',tag))
+                    self.coords(item, x+pad,y1+h/2)
+                    self.itemconfigure(item, text=text, font=font,
+                                       anchor=self.align, state='normal',
+                                       tags=('text',tag))
+                self._slots[key] = r
                 r+=1
+            i+=1
+        return
+
+    def redrawScrolled(self):
+        """Redraw after a vertical scroll, only rows that came into view
+        are drawn and those that left are removed. The header is fully
+        redrawn if the new labels need wider columns."""
+
+        v = self.table.visiblerows
+        old = getattr(self, 'drawnrows', None)
+        new = (v[0], v[-1]+1)
+        if old is None or new[0] >= old[1] or new[1] <= old[0]:
+            self.redraw(align=getattr(self, 'align', 'w'))
+            return
+        if new[1]-new[0] > self._poolsize:
+            self.redraw(align=self.align)
+            return
+        exposed = util.getRangeDifference(new, old)
+        labels = []
+        for r0,r1 in exposed:
+            cols, widths, xpos = self.getLabels(list(range(r0,r1)))
+            if len(widths) != len(self.widths) or \
+                np.any(np.array(widths) > np.array(self.widths)):
+                self.redraw(align=self.align)
+                return
+            labels.append((r0, cols))
+        size = self._poolsize
+        for r0,r1 in util.getRangeDifference(old, new):
+            for row in range(r0,r1):
+                for i in range(len(self.widths)):
+                    key = (row % size, i)
+                    if self._slots.get(key) == row:
+                        self.hideSlot(key)
+        for r0, cols in labels:
+            self.drawRows(r0, cols)
+        self.drawnrows = new
         return
 
     def setWidth(self, w):
@@ -688,19 +898,16 @@ class RowHeader(Canvas):
         #draw the selected rows
         if self.endrow != self.startrow:
             if self.endrow < self.startrow:
-                rowlist=list(range(self.endrow, self.startrow+1))
+                rowlist=range(self.endrow, self.startrow+1)
             else:
-                rowlist=list(range(self.startrow, self.endrow+1))
-            self.drawSelectedRows(rowlist)
+                rowlist=range(self.startrow, self.endrow+1)
             self.table.multiplerowlist = rowlist
-            self.table.drawMultipleRows(rowlist)
-            self.table.drawMultipleCells()
             self.table.allrows = False
         else:
             self.table.multiplerowlist = []
             self.table.multiplerowlist.append(rowover)
-            self.drawSelectedRows(rowover)
-            self.table.drawMultipleRows(self.table.multiplerowlist)
+        #drawn at most maxfps times a second while dragging
+        self.table.scheduleRedraw('selection', throttle=True)
         return
 
     def toggleIndex(self):
@@ -719,6 +926,7 @@ class RowHeader(Canvas):
             this function, it will take its values from defined dicts in constructor"""
 
         defaultactions = {"Sort by index" : lambda: self.table.sortTable(index=True),
+                         "Restore original order" : lambda: self.table.restoreOrder(),
                          "Reset index" : lambda: self.table.resetIndex(),
                          "Toggle index" : lambda: self.toggleIndex(),
                          "Copy index to column" : lambda: self.table.copyIndex(),
@@ -729,7 +937,7 @@ class RowHeader(Canvas):
                          "Delete Row(s)" : lambda: self.table.deleteRow(),
                          "Duplicate Row(s)":  lambda: self.table.duplicateRows(),
                          "Set Row Color" : lambda: self.table.setRowColors(cols='all')}
-        main = ["Sort by index","Reset index","Toggle index",
+        main = ["Sort by index","Restore original order","Reset index","Toggle index",
                 "Rename index","Sort columns by row","Copy index to column",
                 "Add Row(s)","Delete Row(s)", "Duplicate Row(s)", "Set Row Color"]
 
@@ -746,18 +954,22 @@ class RowHeader(Canvas):
         return popupmenu
 
     def drawSelectedRows(self, rows=None):
-        """Draw selected rows, accepts a list or integer"""
+        """Draw selected rows, accepts a list or integer. One rectangle
+        is drawn per run of rows, reusing the existing ones."""
 
-        self.delete('rect')
-        if type(rows) is not list:
-            rowlist=[]
-            rowlist.append(rows)
-        else:
-           rowlist = rows
-        for r in rowlist:
-            if r not in self.table.visiblerows:
-                continue
-            self.drawRect(r, delete=0)
+        v = self.table.visiblerows
+        if rows is None or len(v) == 0:
+            self.delete('rect')
+            return
+        i = self.inset
+        rects = []
+        for a,b in RangeList(rows).intersect(v[0], v[-1]+1):
+            x1,y1,x2,y = self.table.getCellCoords(a, 0)
+            x1,y,x2,y2 = self.table.getCellCoords(b-1, 0)
+            rects.append((0+i,y1+i,self.width-i,y2, {'fill':'#0099CC',
+                          'outline':'gray25', 'width':0, 'tags':'rect'}))
+        util.updateRectangles(self, 'rect', rects)
+        self.lift('text')
         return
 
     def drawRect(self, row=None, tag=None, color=None, outline=None, delete=1):
@@ -795,14 +1007,22 @@ class IndexHeader(Canvas):
             self.color = '#C8C8C8'
             self.startrow = self.endrow = None
             self.model = self.table.model
+            self.drawnkey = None
             self.bind('<Button-1>',self.handle_left_click)
         return
 
     def redraw(self, align='w'):
-        """Redraw row index header"""
+        """Redraw row index header, skipped if the names and widths
+        are unchanged since the last draw"""
 
         df = self.model.df
         rowheader = self.table.rowheader
+        key = (tuple(df.index.names), tuple(rowheader.widths), rowheader.width,
+               self.table.rowheight, self.table.showindex, self.table.getFontKey(),
+               df.columns.nlevels, align)
+        if key == self.drawnkey:
+            return
+        self.drawnkey = key
         self.width = rowheader.width
         self.delete('text','rect')
         if self.table.showindex == False:
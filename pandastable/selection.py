@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+    Selection model for pandastable.
+    Created Oct 2026
+    Copyright (C) Damien Farrell
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    as published by the Free Software Foundation; either version 3
+    of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program; if not, write to the Free Software
+    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+from __future__ import absolute_import, division, print_function
+import numpy as np
+
+class RangeList(object):
+    """A list of row or column positions stored as disjoint ranges.
+    Behaves like a list of ints so existing code can index, iterate and
+    append to it, but selecting a block of n rows only stores its ends.
+    Ranges are kept in the order they were added, adjacent ones are
+    merged."""
+
+    def __init__(self, values=None):
+        self.ranges = []
+        if values is None:
+            return
+        if isinstance(values, RangeList):
+            self.ranges = [list(r) for r in values.ranges]
+        elif isinstance(values, range) and values.step == 1:
+            if len(values) > 0:
+                self.ranges = [[values.start, values.stop]]
+        elif isinstance(values, (int, np.integer)):
+            self.ranges = [[int(values), int(values)+1]]
+        else:
+            self.extend(values)
+        return
+
+    @classmethod
+    def fromData(cls, data):
+        """Create from saved data, either a list of positions or of
+        [start, stop] pairs from getData"""
+
+        if data is None:
+            return cls()
+        if isinstance(data, list) and len(data) > 0 and \
+            isinstance(data[0], (list, tuple)):
+            r = cls()
+            for a,b in data:
+                r.addRange(a, b)
+            return r
+        return cls(data)
+
+    def getData(self):
+        """Ranges as a list of [start, stop] pairs for saving"""
+
+        return [list(r) for r in self.ranges]
+
+    def addRange(self, start, stop):
+        """Add the positions start to stop, skipping any already present"""
+
+        start, stop = int(start), int(stop)
+        if stop <= start:
+            return
+        for a,b in self.intersect(start, stop):
+            #only add the parts not already in the list
+            if a > start:
+                self._add(start, a)
+            start = b
+        if start < stop:
+            self._add(start, stop)
+        return
+
+    def _add(self, start, stop):
+        if len(self.ranges) > 0 and self.ranges[-1][1] == start:
+            self.ranges[-1][1] = stop
+        else:
+            self.ranges.append([start, stop])
+        return
+
+    def append(self, value):
+        value = int(value)
+        self.addRange(value, value+1)
+        return
+
+    def extend(self, values):
+        if isinstance(values, RangeList):
+            for a,b in values.ranges:
+                self.addRange(a, b)
+            return
+        if isinstance(values, range) and values.step == 1:
+            self.addRange(values.start, values.stop)
+            return
+        v = np.asarray(list(values) if not hasattr(values, '__len__') else values)
+        if len(v) == 0:
+            return
+        v = v.astype(int)
+        #split into runs of consecutive positions
+        breaks = np.nonzero(np.diff(v) != 1)[0]+1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(v)]])
+        for s,e in zip(starts, ends):
+            self.addRange(v[s], v[e-1]+1)
+        return
+
+    def remove(self, value):
+        """Remove a position, splitting the range it is in"""
+
+        value = int(value)
+        for i,(a,b) in enumerate(self.ranges):
+            if a <= value < b:
+                new = [r for r in ([a,value],[value+1,b]) if r[1] > r[0]]
+                self.ranges[i:i+1] = new
+                return
+        raise ValueError('%s not in list' %value)
+
+    def intersect(self, start, stop):
+        """Sorted list of (start, stop) parts of the ranges inside
+        start to stop, e.g. the visible rows"""
+
+        out = []
+        for a,b in self.ranges:
+            a, b = max(a, start), min(b, stop)
+            if a < b:
+                out.append((a, b))
+        return sorted(out)
+
+    def remap(self, indexer):
+        """Positions of the same rows after rows were inserted or deleted,
+        where indexer gives the old position of each row, -1 for new ones.
+        Positions no longer present are dropped."""
+
+        r = RangeList()
+        if len(self.ranges) == 0:
+            return r
+        n = max(b for a,b in self.ranges)
+        selected = np.zeros(n+1, dtype=bool)
+        for a,b in self.ranges:
+            selected[a:b] = True
+        indexer = np.asarray(indexer)
+        old = np.where((indexer < 0) | (indexer > n), n, indexer)
+        r.extend(np.flatnonzero(selected[old]))
+        return r
+
+    def getIndexer(self):
+        """Positions for iloc, a slice if this is one range so that
+        no positions array is created"""
+
+        if len(self.ranges) == 1:
+            return slice(*self.ranges[0])
+        return np.asarray(self)
+
+    def isRange(self):
+        """True if this is one contiguous range"""
+
+        return len(self.ranges) == 1
+
+    def __len__(self):
+        return sum(b-a for a,b in self.ranges)
+
+    def __iter__(self):
+        for a,b in self.ranges:
+            for i in range(a, b):
+                yield i
+
+    def __contains__(self, value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return False
+        for a,b in self.ranges:
+            if a <= value < b:
+                return True
+        return False
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        n = len(self)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError('list index out of range')
+        for a,b in self.ranges:
+            if i < b-a:
+                return a+i
+            i -= b-a
+
+    def __array__(self, dtype=None, copy=None):
+        if len(self.ranges) == 0:
+            arr = np.array([], dtype=np.intp)
+        else:
+            arr = np.concatenate([np.arange(a, b, dtype=np.intp) for a,b in self.ranges])
+        if dtype is not None:
+            arr = arr.astype(dtype)
+        return arr
+
+    def __eq__(self, other):
+        if isinstance(other, RangeList):
+            return self.ranges == other.ranges
+        if isinstance(other, (list, tuple, range)):
+            return len(self) == len(other) and list(self) == list(other)
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'RangeList(%s)' %', '.join('%s:%s' %(a,b) for a,b in self.ranges)
@@ -27,10 +27,12 @@ try:
 except:
     from Tkinter import *
     from ttk import *
+import numpy as np
 import pandas as pd
 from .core import Table
 from .data import TableModel
 from .app import DataExplore
+from . import formatting
 import unittest
 import threading
 
@@ -124,6 +126,188 @@ class TableTests(unittest.TestCase):
         table.load('temp.mpk')
         return
 
+    def testF(self):
+        """Scrolling reuses pooled cell text items"""
+
+        table = self.app.table
+        table.redraw()
+        items = set(table.find_withtag('text'))
+        for i in range(20):
+            table.set_yviews('scroll', 1, 'units')
+            table.update_idletasks()
+        created = set(table.find_withtag('text')) - items
+        print ('text items created in 20 scroll steps: %s' %len(created))
+        #at most one extra row of slots when a partial row becomes visible
+        self.assertTrue(len(created) <= len(table.visiblecols))
+        return
+
+    def testG(self):
+        """Selections are stored as ranges"""
+
+        table = self.app.table
+        table.redraw()
+        table.selectAll()
+        self.assertEqual(table.multiplerowlist.ranges, [[0, table.rows]])
+        df = table.getSelectedDataFrame()
+        self.assertEqual(df.shape, table.model.df.shape)
+        table.setSelectedRow(2)
+        table.multiplerowlist.append(5)
+        table.multiplerowlist.append(3)
+        self.assertEqual(list(table.multiplerowlist), [2,5,3])
+        table.multiplerowlist.remove(5)
+        self.assertEqual(len(table.getSelectedDataFrame()), 2)
+        return
+
+    def testH(self):
+        """Virtual scrolling draws tall tables one page at a time"""
+
+        table = self.app.table
+        table.maxcanvasheight = 100
+        table.redraw()
+        self.assertTrue(table.isVirtual())
+        table.set_yviews('moveto', 0.5)
+        table.update_idletasks()
+        self.assertEqual(table.visiblerows[0], table.rowoffset)
+        x1,y1,x2,y2 = table.getCellCoords(table.rowoffset, 0)
+        self.assertEqual(y1, table.y_start)
+        #a cell selection from the first row stays on the page
+        table.multiplerowlist = list(range(0, table.rowoffset+2))
+        table.multiplecollist = [0, 1]
+        table.drawMultipleCells()
+        top, bottom = table.getRowExtent()
+        y = table.coords('multicellrect')
+        self.assertTrue(top-2 <= y[1] and y[3] <= bottom+2)
+        return
+
+    def testI(self):
+        """Zoom reconfigures the shared font and scales column widths"""
+
+        table = self.app.table
+        f = table.thefont
+        w = dict(table.columnwidths)
+        size = table.fontsize
+        table.flushRedraw()
+        paints = table.getRedrawStats()['paints']
+        table.zoomIn()
+        self.assertIs(table.thefont, f)
+        self.assertEqual(f.actual('size'), size+1)
+        for c in w:
+            self.assertTrue(table.columnwidths[c] >= w[c])
+        table.zoomOut()
+        self.assertEqual(table.fontsize, size)
+        #the scaled view is drawn again once when idle
+        self.assertEqual(table.getRedrawStats()['paints'], paints)
+        table.flushRedraw()
+        self.assertEqual(table.getRedrawStats()['paints'], paints+1)
+        return
+
+    def testJ(self):
+        """Filters give the same rows when cached masks are reused"""
+
+        from .dialogs import QueryDialog
+        table = self.app.table
+        df = table.model.df.copy()
+        col = df.columns[0]
+        value = df[col].median()
+        q = QueryDialog(table)
+        q.addFilter()
+        q.filters[0].filtercol.set(col)
+        q.filters[0].operator.set('>')
+        q.filters[0].filtercolvalue.set(str(value))
+        q.query()
+        expected = df[col] > value
+        self.assertEqual(len(table.model.df), expected.sum())
+        q.addFilter()
+        q.filters[1].filtercol.set('label')
+        q.filters[1].operator.set('equals')
+        q.filters[1].filtercolvalue.set('low')
+        q.query()
+        expected &= df.label == 'low'
+        self.assertEqual(len(table.model.df), expected.sum())
+        q.filters[1].booleanop.set('OR')
+        q.query()
+        expected = (df[col] > value) | (df.label == 'low')
+        self.assertEqual(len(table.model.df), expected.sum())
+        #cached masks are dropped when a table method changes the column
+        table.showAll()
+        table.fillDown(range(len(df)), [0])
+        q.query()
+        expected = (df[col].iloc[0] > value) | (df.label == 'low')
+        self.assertEqual(len(table.model.df), expected.sum())
+        q.close()
+        self.assertEqual(len(table.model.df), len(df))
+        return
+
+    def testK(self):
+        """Clear and fill down work on range selections"""
+
+        table = self.app.table
+        table.redraw()
+        table.multiplerowlist = range(2,6)
+        table.multiplecollist = [0,1]
+        table.fillDown(table.multiplerowlist, table.multiplecollist)
+        df = table.model.df
+        val = df.iloc[2,0]
+        self.assertTrue((df.iloc[3:6,:2] == val).all().all())
+        self.assertEqual(list(table.multiplerowlist), [2,3,4,5])
+        table.multiplerowlist.append(8)
+        table.deleteCells(table.multiplerowlist, table.multiplecollist, answer=True)
+        self.assertTrue(df.iloc[[2,3,4,5,8],:2].isnull().all().all())
+        self.assertFalse(df.iloc[6:8,:2].isnull().any().any())
+        return
+
+    def testL(self):
+        """Values changed in place on a sorted table are kept when the
+        order is restored"""
+
+        table = self.app.table
+        table.sortTable(0)
+        table.fillDown(range(0,4), [1])
+        filled = table.model.df.iloc[:4,1]
+        table.restoreOrder()
+        df = table.model.df
+        self.assertTrue((df.loc[filled.index, filled.name] == filled).all())
+        return
+
+    def testM(self):
+        """Scheduled redraws keep the formatted pages until the data
+        changes, redraw formats cells again"""
+
+        table = self.app.table
+        table.redraw()
+        cache = table._pagecache
+        pages = dict(cache.pages)
+        self.assertTrue(len(pages) > 0)
+        table.scheduleRedraw()
+        table.flushRedraw()
+        for key in pages:
+            self.assertIs(cache.pages[key], pages[key])
+        table.fillDown(range(0,4), [0])
+        table.scheduleRedraw()
+        table.flushRedraw()
+        self.assertEqual(cache.version, table.model.version)
+        self.assertFalse(set(pages) & set(cache.pages))
+        df = table.model.df
+        df.iloc[1,1] = 777.0
+        table.redraw()
+        page = cache.pages[(table.model.version, 0, 0, table.floatprecision)][0]
+        self.assertIn('777', page[1,1])
+        return
+
+    def testN(self):
+        """Formatting rule colors follow columns changed in place"""
+
+        table = self.app.table
+        df = table.model.df
+        name = df.columns[0]
+        table.colorrules[name] = [formatting.makeRule('topn', n=3, color='green')]
+        table.getRuleColors(0, 0, 10)
+        df[name] = -np.arange(len(df), dtype=float)
+        self.assertEqual(list(table.getRuleColors(0, 0, 4)), ['green']*3+[None])
+        table.fillDown(range(0,len(df)), [0])
+        self.assertEqual(list(table.getRuleColors(0, 0, 2)), ['green']*2)
+        return
+
     '''def testE(self):
         """Plugins test"""
 
@@ -136,6 +320,341 @@ class TableTests(unittest.TestCase):
     def quit(self):
         self.app.quit()
 
+class FormattingTests(unittest.TestCase):
+    """Display formatting tests, these don't need a table"""
+
+    def testA(self):
+        """Block formatting matches per cell formatting"""
+
+        df = TableModel.getSampleData(rows=100)
+        df['cat'] = df.label.astype('category')
+        df.iloc[3,0] = np.nan
+        rows = list(range(10,60))
+        cols = list(range(len(df.columns)))
+        text = formatting.formatBlock(df, rows, cols)
+        for j in cols:
+            vals = df.iloc[rows,j].astype(object).fillna('')
+            self.assertEqual(list(text[:,j]), [str(v) for v in vals])
+        text = formatting.formatBlock(df, [3,4], [0], prec=2)
+        x = df.iloc[4,0]
+        self.assertEqual(text[0,0], '')
+        self.assertEqual(text[1,0], '{:.2f}'.format(x) if x>=1 else '{:.2g}'.format(x))
+        return
+
+    def testB(self):
+        """Formatting rules give the same colors for any block of rows"""
+
+        s = pd.Series([5.0, np.nan, 1.0, 9.0, 3.0, 7.0])
+        rules = [formatting.makeRule('threshold', op='>', value=4, color='red'),
+                 formatting.makeRule('topn', n=2, color='green'),
+                 formatting.makeRule('nulls', color='black')]
+        stats = formatting.getRuleStats(s, rules)
+        clrs = formatting.applyRules(s.values, rules, stats)
+        self.assertEqual(list(clrs), ['red','black',None,'green',None,'green'])
+        part = formatting.applyRules(s.values[3:], rules, stats)
+        self.assertEqual(list(part), list(clrs[3:]))
+        return
+
+    def testC(self):
+        """Cached pages give the same text as formatting the block"""
+
+        df = TableModel.getSampleData(rows=300)
+        cache = formatting.PageCache(pagerows=16, pagecols=2)
+        rows, cols = range(10,100), range(1,len(df.columns))
+        text = cache.getBlock(df, 1, rows, cols, 2)
+        self.assertTrue((text == formatting.formatBlock(df, rows, cols, 2)).all())
+        cache.prefetch(df, 1, rows, cols, 2)
+        text = cache.getBlock(df, 1, range(5,50), cols, 2)
+        self.assertTrue((text == formatting.formatBlock(df, range(5,50), cols, 2)).all())
+        cache.stop()
+        #a page formatted before the cache was cleared is not kept
+        key = (1, 0, 0, 2)
+        page = cache.formatPage(df, key)
+        generation = cache.generation
+        cache.clear()
+        cache.store(key, page, generation)
+        self.assertNotIn(key, cache.pages)
+        return
+
+class ModelTests(unittest.TestCase):
+    """Data model tests, these don't need a table"""
+
+    def testA(self):
+        """Column profiles match the data and follow cell edits"""
+
+        df = TableModel.getSampleData(rows=300)
+        model = TableModel(df)
+        profiler = model.profiler
+        d = profiler.describe(df)
+        self.assertTrue(np.allclose(d.values, df.describe()[d.columns].values))
+        p = profiler.getProfile(df, 5)
+        self.assertEqual(p['maxlength'], model.getlongestEntry(5))
+        model.setValueAt(1000, 3, 0)
+        p = profiler.getProfile(model.df, 0, wait=False)
+        self.assertEqual(p['max'], 1000)
+        self.assertAlmostEqual(p['mean'], model.df.iloc[:,0].mean())
+        #values replaced without marking them changed are noticed
+        col = df.columns[1]
+        df[col] = df[col]*2
+        d = profiler.describe(df)
+        self.assertTrue(np.allclose(d[col], df[col].describe()))
+        #edits anywhere in a column marked changed are seen
+        df.iloc[7,1] = 1e6
+        model.dataChanged(cols=[col])
+        self.assertEqual(profiler.getProfile(df, 1)['max'], 1e6)
+        model.df = df.iloc[:10]
+        self.assertEqual(profiler.getProfile(model.df, 0, wait=False), None)
+        return
+
+    def testB(self):
+        """Cached column arrays give the same values as iloc"""
+
+        df = TableModel.getSampleData(rows=100)
+        df['cat'] = df.label.astype('category')
+        model = TableModel(df)
+        for c in range(len(df.columns)):
+            self.assertEqual(model.getValueAt(7,c), df.iloc[7,c])
+        model.setValueAt('2.5', 7, 0)
+        self.assertEqual(model.getValueAt(7,0), 2.5)
+        model.setValueAt('x', 8, 0)
+        self.assertEqual(model.getValueAt(8,0), 'x')
+        self.assertEqual(model.getValueAt(7,0), 2.5)
+        return
+
+    def testC(self):
+        """Batch row inserts, appends and deletes keep the other rows"""
+
+        df = TableModel.getSampleData(rows=100)
+        model = TableModel(df)
+        indexer = model.insertRows([0, 10, 10])
+        self.assertEqual(len(model.df), 103)
+        self.assertEqual(list(np.flatnonzero(indexer < 0)), [0, 11, 12])
+        self.assertTrue(model.df.iloc[11].isnull().all())
+        for i in range(5):
+            model.appendRows(3)
+        self.assertEqual(len(model.df), 118)
+        self.assertTrue(model.df.index.is_unique)
+        self.assertEqual(model.df.iloc[1,0], df.iloc[0,0])
+        indexer = model.deleteRows([0, 11, 12])
+        self.assertEqual(list(indexer[:12]), [1,2,3,4,5,6,7,8,9,10,13,14])
+        self.assertTrue((model.df.iloc[:100].values == df.values).all())
+        return
+
+    def testD(self):
+        """Sorting keeps the original order to restore, with edits"""
+
+        df = TableModel.getSampleData(rows=200)
+        model = TableModel(df.copy())
+        cols = list(df.columns[[4,0]])
+        model.sortRows(cols, ascending=[False, True])
+        expected = df.sort_values(cols, ascending=[False, True])
+        self.assertTrue(model.df[cols].equals(expected[cols]))
+        label = model.df.index[0]
+        model.setValueAt(-1000, 0, 1)
+        model.sortRows([df.columns[1]])
+        self.assertEqual(model.df.index[0], label)
+        model.restoreOrder()
+        self.assertTrue(model.df.index.equals(df.index))
+        self.assertEqual(model.df.iloc[label,1], -1000)
+        self.assertFalse(model.isSorted())
+        return
+
+    def testE(self):
+        """Filtered rows are taken from the unfiltered table and edits
+        are kept when the filter is cleared"""
+
+        df = TableModel.getSampleData(rows=200)
+        model = TableModel(df.copy())
+        base = model.getUnfiltered()
+        col = df.columns[0]
+        mask = (base[col] > base[col].median()).values
+        model.setRowFilter(mask)
+        self.assertTrue(model.df.equals(df[mask]))
+        model.sortRows([col])
+        self.assertEqual(len(model.df), mask.sum())
+        label = model.df.index[0]
+        model.setValueAt(-1000, 0, 0)
+        model.setRowFilter(None)
+        self.assertEqual(len(model.df), len(df))
+        self.assertEqual(model.df.loc[label, col], -1000)
+        #only the sorted rows are kept while not filtered
+        self.assertIsNone(model.getSortBase(build=False)[0])
+        model.restoreOrder()
+        self.assertTrue(model.df.index.equals(df.index))
+        self.assertEqual(model.df.loc[label, col], -1000)
+        return
+
+    def testG(self):
+        """Columns changed while filtered are kept when the filter is
+        cleared, and cell edits after them are still written through"""
+
+        df = pd.DataFrame({'a': np.random.normal(size=200),
+                           'b': np.random.normal(size=200)})
+        model = TableModel(df.copy())
+        col = df.columns[0]
+        mask = (df[col] > df[col].median()).values
+        model.setRowFilter(mask)
+        view = model.df
+        view[col] = view[col]*2
+        view['new'] = view[col]+1
+        model.dataChanged(cols=[col,'new'])
+        model.moveColumn(len(view.columns)-1, 0)
+        label = model.df.index[1]
+        model.setValueAt(-1000, 1, 1)
+        model.dataChanged(cols=['new'])
+        model.setValueAt(-2000, 2, 1)
+        model.setRowFilter(None)
+        new = model.df
+        self.assertEqual(list(new.columns), ['new']+list(df.columns))
+        expected = df[col].where(~mask, df[col]*2)
+        expected.iloc[np.flatnonzero(mask)[1:3]] = [-1000, -2000]
+        self.assertTrue((new[col] == expected).all())
+        self.assertEqual(new.loc[label, col], -1000)
+        self.assertTrue(new['new'][~mask].isnull().all())
+        self.assertTrue((new['new'][mask] == view['new'].values).all())
+        #sort orders of changed columns are not reused
+        model.sortRows([col])
+        model.restoreOrder()
+        new[col] = -new[col]
+        model.dataChanged(cols=[col])
+        model.sortRows([col])
+        self.assertTrue(model.df[col].is_monotonic_increasing)
+        return
+
+    def testH(self):
+        """Columns written back after sorting a filtered table by its
+        index go to the right rows, and rows reordered in place are not
+        used to write back"""
+
+        df = pd.DataFrame({'a': np.random.normal(size=100),
+                           'b': np.random.normal(size=100)})
+        col = 'a'
+        mask = (df[col] > df[col].median()).values
+        model = TableModel(df.copy())
+        model.setRowFilter(mask)
+        model.sortRows([], ascending=False)
+        self.assertTrue(model.df.index.is_monotonic_decreasing)
+        view = model.df
+        view[col] = view.index.to_numpy(dtype=float)
+        model.dataChanged(cols=[col])
+        model.setRowFilter(None)
+        model.restoreOrder()
+        new = model.df
+        self.assertTrue((new[col][mask] == new.index[mask]).all())
+        self.assertTrue((new[col][~mask] == df[col][~mask]).all())
+        model = TableModel(df.copy())
+        model.setRowFilter(mask)
+        model.df.sort_index(inplace=True, ascending=False)
+        model.df[col] = model.df.index.to_numpy(dtype=float)
+        model.dataChanged(cols=[col])
+        model.setRowFilter(None)
+        new = model.df
+        kept = new[col] == df[col].reindex(new.index)
+        self.assertTrue((kept | (new[col] == new.index)).all())
+        return
+
+    def testI(self):
+        """Edits while filtered are kept after changes to the whole table
+        such as renamed columns, and rows added or deleted while filtered
+        are added to or deleted from the unfiltered table"""
+
+        df = pd.DataFrame({'a': np.arange(100, dtype=float),
+                           'b': np.arange(100, dtype=float)})
+        mask = (df.index % 2 == 0)
+        model = TableModel(df.copy())
+        model.setRowFilter(mask)
+        model.dataChanged()
+        model.setValueAt(-1.0, 0, 0)
+        model.df.rename(columns={'b':'c'}, inplace=True)
+        model.dataChanged()
+        model.setValueAt(-2.0, 1, 1)
+        model.setRowFilter(None)
+        new = model.df
+        self.assertEqual(len(new), 100)
+        self.assertEqual(list(new.columns), ['a','c'])
+        self.assertEqual(new.loc[0,'a'], -1.0)
+        self.assertEqual(new.loc[2,'c'], -2.0)
+        self.assertEqual(new.loc[1,'c'], 1.0)
+        #rows added and deleted while filtered
+        model = TableModel(df.copy())
+        model.setRowFilter(mask)
+        model.sortRows(['a'], ascending=False)
+        model.deleteRows([0])
+        model.insertRows([1])
+        self.assertEqual(len(model.df), 50)
+        self.assertTrue(np.isnan(model.df.iloc[1,0]))
+        model.setRowFilter(None)
+        model.restoreOrder()
+        new = model.df
+        self.assertEqual(len(new), 100)
+        self.assertNotIn(98, new['a'].values)
+        pos = list(new['a'].values).index(96)
+        self.assertTrue(np.isnan(new['a'].iloc[pos+1]))
+        #index reset while filtered applies to all rows
+        model = TableModel(df.copy())
+        model.setRowFilter(mask)
+        model.resetIndex(drop=False)
+        model.setValueAt(-3.0, 1, 1)
+        model.setRowFilter(None)
+        self.assertEqual(len(model.df), 100)
+        self.assertEqual(list(model.df.columns), ['index','a','b'])
+        self.assertEqual(model.df.iloc[2,1], -3.0)
+        return
+
+    def testF(self):
+        """Sorted indexes give the same rows as scanning a column"""
+
+        df = TableModel.getSampleData(rows=500)
+        df.iloc[::7,0] = np.nan
+        model = TableModel(df)
+        col = df.columns[0]
+        value = df[col].median()
+        idx = model.getColumnIndex(col, wait=True)
+        self.assertTrue((idx.lookup('>', value) == (df[col] > value)).all())
+        self.assertTrue((idx.lookup('<', value) == (df[col] < value)).all())
+        self.assertTrue((idx.lookup('not equals', df.iloc[1,0]) ==
+                         (df[col] != df.iloc[1,0])).all())
+        idx = model.getColumnIndex('label', wait=True)
+        self.assertTrue((idx.lookup('equals', 'low') == (df.label == 'low')).all())
+        row = idx.find('low')
+        self.assertEqual(row, np.flatnonzero(df.label == 'low')[0])
+        model.setValueAt('x', 0, 5)
+        self.assertIsNone(model.indexer.get(df, 'label', model.getColumnVersion('label')))
+        df[col] = df[col]*2
+        model.dataChanged(cols=[col])
+        self.assertIsNone(model.getColumnIndex(col, request=False))
+        #text is compared with bools by scanning
+        df['b'] = df[col] > value
+        idx = model.getColumnIndex('b', wait=True)
+        self.assertTrue(idx.accepts(False))
+        self.assertFalse(idx.accepts('False'))
+        self.assertFalse(idx.accepts(0.0))
+        model.indexer.maxbytes = idx.nbytes
+        model.getColumnIndex(col, wait=True)
+        self.assertEqual(list(model.indexer.indexes), [col])
+        return
+
+    def testJ(self):
+        """Range and equality filters on float, int and text columns give
+        the same rows from the sorted indexes as scanning the columns"""
+
+        import operator
+        rows = 20000
+        df = pd.DataFrame({'x': np.random.normal(size=rows),
+                           'n': np.random.randint(0, 1000, rows),
+                           'label': np.random.choice(['low','medium','high'], rows).astype(object)})
+        model = TableModel(df)
+        ops = {'>': operator.gt, '<': operator.lt,
+               'equals': operator.eq, 'not equals': operator.ne}
+        filters = [('x', '>', 2.0), ('x', '<', -1.0), ('n', 'equals', 500),
+                   ('n', '<', 100), ('label', 'equals', 'medium'),
+                   ('label', 'not equals', 'low')]
+        for col, op, val in filters:
+            idx = model.getColumnIndex(col, wait=True)
+            expected = ops[op](df[col], val).to_numpy()
+            self.assertTrue((idx.lookup(op, val) == expected).all())
+        return
+
 class DataExploreTests(unittest.TestCase):
     def setUp(self):
         return
@@ -26,32 +26,136 @@ try:
 except:
     from Tkinter import *
     from ttk import *
+from tkinter import font as tkfont
 import math, time
 import os, types
 import string, copy
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 
 SCRATCH = None
+#per font character widths and an LRU of whole string widths
+FONTWIDTHS = {}
+TEXTWIDTHS = OrderedDict()
+MAXTEXTWIDTHS = 20000
 
-
-def getTextLength(text, w, font=None):
-    """Get correct canvas text size (chars) that will fit in
-    a given canvas width"""
+def getFontWidths(font=None):
+    """Get the cached character widths for a font. The scratch canvas is
+    only used once per font, to find the padding that canvas text items
+    add to the measured width in their bbox."""
 
     global SCRATCH
+    key = font
+    if type(font) not in [str, tuple]:
+        key = str(font)
+    if key in FONTWIDTHS:
+        return FONTWIDTHS[key]
     if SCRATCH is None:
         SCRATCH = Canvas()
     scratch = SCRATCH
-    length = len(text)
-    t = scratch.create_text((0,0), text=text, font=font)
+    if font is None:
+        f = tkfont.Font(root=scratch, font='TkDefaultFont')
+    else:
+        f = tkfont.Font(root=scratch, font=font)
+    t = scratch.create_text((0,0), text='X', font=font)
     b = scratch.bbox(t)
     scratch.delete(t)
-    twidth = b[2]-b[0]
+    pad = b[2]-b[0] - f.measure('X')
+    fw = FONTWIDTHS[key] = {'font': f, 'pad': pad, 'chars': {}}
+    return fw
+
+def getTextWidth(text, font=None):
+    """Get the width in pixels of text drawn on a canvas, from cached
+    character widths so that no canvas items are needed"""
+
+    key = (font, text)
+    if type(font) not in [str, tuple]:
+        key = (str(font), text)
+    try:
+        twidth = TEXTWIDTHS[key]
+        TEXTWIDTHS.move_to_end(key)
+        return twidth
+    except KeyError:
+        pass
+    fw = getFontWidths(font)
+    chars = fw['chars']
+    lines = text.split('\n')
+    twidth = 0
+    for line in lines:
+        for c in set(line):
+            if c not in chars:
+                chars[c] = fw['font'].measure(c)
+        twidth = max(twidth, sum([chars[c] for c in line]))
+    twidth += fw['pad']
+    TEXTWIDTHS[key] = twidth
+    if len(TEXTWIDTHS) > MAXTEXTWIDTHS:
+        TEXTWIDTHS.popitem(last=False)
+    return twidth
+
+def clearFontCache(font=None):
+    """Clear cached text measurements, e.g. when the scratch canvas goes,
+    or only those of a named font that has been reconfigured"""
+
+    if font is None:
+        FONTWIDTHS.clear()
+        TEXTWIDTHS.clear()
+        return
+    name = str(font)
+    FONTWIDTHS.pop(name, None)
+    for key in [k for k in TEXTWIDTHS if k[0] == name]:
+        del TEXTWIDTHS[key]
+    return
+
+def getTextLength(text, w, font=None):
+    """Get correct canvas text size (chars) that will fit in
+    a given canvas width"""
+
+    length = len(text)
+    twidth = getTextWidth(text, font)
     ratio = length/twidth
     length = math.floor(w*ratio)
     return twidth,length
 
+def getRangeDifference(a, b):
+    """Get the parts of range a=(start,end) that are not in range b,
+    as a list of (start,end) tuples"""
+
+    parts = []
+    if a[0] < b[0]:
+        parts.append((a[0], min(a[1], b[0])))
+    if a[1] > b[1]:
+        parts.append((max(a[0], b[1]), a[1]))
+    return [p for p in parts if p[0] < p[1]]
+
+def updateRectangles(canvas, tag, rects):
+    """Show a list of (x1,y1,x2,y2,options) rectangles on a canvas by
+    moving the items already tagged with tag. Items are only created or
+    deleted when the number of rectangles changes."""
+
+    items = canvas.find_withtag(tag)
+    for i in range(len(rects)):
+        x1,y1,x2,y2,kwds = rects[i]
+        if i < len(items):
+            canvas.coords(items[i], x1,y1,x2,y2)
+            canvas.itemconfigure(items[i], **kwds)
+        else:
+            canvas.create_rectangle(x1,y1,x2,y2, **kwds)
+    for item in items[len(rects):]:
+        canvas.delete(item)
+    return
+
+def formatBytes(n):
+    """Size in bytes as readable text, e.g. 1.5 MB"""
+
+    for unit in ['bytes','KB','MB','GB']:
+        if abs(n) < 1024 or unit == 'GB':
+            break
+        n = n/1024.0
+    if unit == 'bytes':
+        return '%d %s' %(n, unit)
+    return '%.1f %s' %(n, unit)
+
 def check_multiindex(index):
     """Check if index is a multiindex"""
 
@@ -81,7 +185,7 @@ def setAttributes(obj, data):
 
     for key in data:
         try:
-            obj.__dict__[key] = data[key]
+            setattr(obj, key, data[key])
         except Exception as e:
             print (e)
     return